@@ -260,7 +260,8 @@ def build_dir(args):
     if os.path.exists(pelconf_yaml):
         settings_path = os.path.join(auto_dir, AUTO_SETTINGS)
         builtin_plugins = os.path.join(tool_dir, os.pardir, 'plugins')
-        generate_settings(pelconf_yaml, settings_path, [ builtin_plugins ])
+        generate_settings(pelconf_yaml, settings_path, [ builtin_plugins ],
+                          data_record=args.record, data_replay=args.replay)
     elif os.path.exists(os.path.join(yaml_dir, PELICAN_CONF)):
         settings_path = os.path.join(yaml_dir, PELICAN_CONF)
     else:
@@ -293,13 +294,16 @@ def build_dir(args):
         pass
 
 
-def generate_settings(source_yaml, settings_path, builtin_p_paths=None, sourcepath='.'):
+def generate_settings(source_yaml, settings_path, builtin_p_paths=None, sourcepath='.',
+                      data_record=None, data_replay=None):
     """Generate the Pelican settings file
 
     :param source_yaml: the settings in YAML form
     :param settings_path: the path name to generate
     :param builtin_p_paths: list of plugin paths (defaults to [])
     :param sourcepath: path to source (defaults to '.')
+    :param data_record: snapshot file to record the asfdata sources in (defaults to None)
+    :param data_replay: snapshot file to replay the asfdata sources from (defaults to None)
 
     """
     ydata = yaml.safe_load(open(source_yaml))
@@ -354,6 +358,27 @@ def generate_settings(source_yaml, settings_path, builtin_p_paths=None, sourcepa
     if 'index' in tdata:
         tdata['uses_index'] = 'yes'  # ezt.boolean
 
+    if 'gfm' in ydata:
+        gfm = _helper(
+                unsafe=str(ydata['gfm'].get('unsafe', False)),
+                options=ydata['gfm'].get('options', [ ]),
+                extensions=ydata['gfm'].get('extensions'),
+                )
+
+        tdata['uses_gfm'] = 'yes'  # ezt.boolean()
+        tdata['gfm'] = gfm
+    else:
+        tdata['uses_gfm'] = None
+
+    # Beautiful Soup parser of asfgenid, toc and consensual_youtube
+    tdata['html_parser'] = ydata.get('html_parser')
+
+    # Read the pages in a pool of processes
+    tdata['page_workers'] = None
+    if 'page_workers' in ydata:
+        tdata['page_workers'] = str(ydata['page_workers'])  # 0 is a setting too
+        tdata['use'].append('asfpool')  # add the plugin
+
     if 'genid' in ydata:
         genid = _helper(
                 unsafe=str(ydata['genid'].get('unsafe', False)),
@@ -373,6 +398,10 @@ def generate_settings(source_yaml, settings_path, builtin_p_paths=None, sourcepa
         tdata['uses_genid'] = None
 
     tdata['uses_data'] = None
+    tdata['data_record'] = None
+    tdata['data_replay'] = None
+    tdata['logo_manifest'] = None
+    tdata['svn_workers'] = None
     tdata['uses_run'] = None
     tdata['uses_postrun'] = None
     tdata['uses_ignore'] = None
@@ -385,6 +414,14 @@ def generate_settings(source_yaml, settings_path, builtin_p_paths=None, sourcepa
             tdata['uses_data'] = 'yes'  # ezt.boolean()
             tdata['asfdata'] = sdata['data']
             tdata['use'].append('asfdata')  # add the plugin
+            # Record the data sources in a snapshot, or build from one
+            tdata['data_record'] = data_record and os.path.abspath(data_record)
+            tdata['data_replay'] = data_replay and os.path.abspath(data_replay)
+            # The logos that exist, so they are not checked over the network
+            tdata['logo_manifest'] = sdata.get('logo_manifest')
+            # The svn commands that list releases at the same time
+            if 'svn_workers' in sdata:
+                tdata['svn_workers'] = str(sdata['svn_workers'])  # 0 is a setting too
         # Run the included scripts with the asfrun plugin during initialize
         if 'run' in sdata:
             tdata['uses_run'] = 'yes'  # ezt.boolean
@@ -475,6 +512,8 @@ def main():
     parser_dir.add_argument('--content-dir', help='Where is the content located (default: %(default)s)', default='content')
     parser_dir.add_argument("--debug", help = "Run pelican with debug flag (show full exception traces)", action = "store_true")
     parser_dir.add_argument("--delete", help = "Delete output directory first", action = "store_true")
+    parser_dir.add_argument("--record", help = "Record the asfdata sources in a snapshot file", metavar = "SNAPSHOT")
+    parser_dir.add_argument("--replay", help = "Build offline with the asfdata sources of a snapshot file", metavar = "SNAPSHOT")
     parser_dir.set_defaults(func=build_dir)
 
     args = parser.parse_args()
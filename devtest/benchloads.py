@@ -0,0 +1,142 @@
+#!/usr/bin/env python3
+#
+# Licensed to the Apache Software Foundation (ASF) under one
+# or more contributor license agreements.  See the NOTICE file
+# distributed with this work for additional information
+# regarding copyright ownership.  The ASF licenses this file
+# to you under the Apache License, Version 2.0 (the
+# "License"); you may not use this file except in compliance
+# with the License.  You may obtain a copy of the License at
+#
+#   http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing,
+# software distributed under the License is distributed on an
+# "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY
+# KIND, either express or implied.  See the License for the
+# specific language governing permissions and limitations
+# under the License.
+#
+#
+# benchloads.py -- measure the selected loading of asfdata sources
+#
+# Loads a JSON and a YAML document shaped like whimsy's committee-info.json
+# whole, as asfdata did before, and with the selection of the paths that
+# the sequences of a block use. Checks that both give the same selected
+# data, and reports the time and the peak memory of each load.
+#
+# The documents are generated with --committees committees, or read from
+# files given with --source (.json or .yaml), such as
+#
+#   $ curl -o /tmp/committee-info.json https://whimsy.apache.org/public/committee-info.json
+#
+# USAGE:
+#   $ ./benchloads.py
+#   $ ./benchloads.py --source /tmp/committee-info.json --path officers,committees.board.roster
+#
+
+import sys
+import os
+import argparse
+import json
+import random
+import time
+import tracemalloc
+
+import yaml
+
+THIS_DIR = os.path.abspath(os.path.dirname(__file__))
+PLUGINS = os.path.join(THIS_DIR, os.pardir, 'plugins')
+sys.path.insert(0, PLUGINS)
+
+import asfdata  # pylint: disable=wrong-import-position
+
+
+# a document with the structure of committee-info.json
+def generate(committees, seed):
+    r = random.Random(seed)
+    roster = lambda count: { f'id{n}': { 'name': f'Committer {n}', 'date': '2019-06-01' } for n in range(count) }
+    return {
+        'last_updated': '2024-06-01 12:00:00 UTC',
+        'committee_count': committees,
+        'pmc_count': committees - 10,
+        'committees': { f'project{c}': { 'display_name': f'Project {c}',
+                                         'site': f'https://project{c}.apache.org/',
+                                         'description': 'A project that does something useful ' * 3,
+                                         'mail_list': f'project{c}',
+                                         'established': '01/2010',
+                                         'report': [ 'January', 'April', 'July', 'October' ],
+                                         'chair': 'id0',
+                                         'pmc': c >= 10,
+                                         'roster_count': 30,
+                                         'roster': roster(r.randint(3, 60)) }
+                        for c in range(committees) },
+        'officers': { f'officer{o}': { 'display_name': f'Officer {o}', 'paragraph': 'Officers',
+                                       'roster': roster(1) }
+                      for o in range(40) },
+    }
+
+
+# time and peak memory of the best of repeat loads
+def measure(load, repeat):
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        load()
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    tracemalloc.start()
+    try:
+        result = load()
+        peak = tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+    return result, best, peak
+
+
+def bench(name, content, selection, repeat):
+    def whole():
+        return asfdata.select_data(asfdata.load_data(name, content, False), selection)
+
+    def selected():
+        return asfdata.load_data(name, content, False, selection)
+
+    before, before_time, before_peak = measure(whole, repeat)
+    after, after_time, after_peak = measure(selected, repeat)
+    result = 'identical' if before == after else 'DIFFERENT'
+    print(f'{os.path.basename(name):<28} {len(content) / 1e6:>6.1f} {before_time:>9.3f} {after_time:>9.3f} '
+          f'{before_peak / 1e6:>9.1f} {after_peak / 1e6:>9.1f}  {result}')
+    return before == after
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark the selected loading of asfdata sources.')
+    parser.add_argument('--source', action='append', default=[ ], help='a .json or .yaml source (repeatable)')
+    parser.add_argument('--path', default='officers,committees.project1.roster,committee_count',
+                        help='comma-separated paths that the sequences use (default: %(default)s)')
+    parser.add_argument('--committees', type=int, default=500, help='committees of the generated documents (default: %(default)s)')
+    parser.add_argument('--seed', type=int, default=1, help='random seed for the generated documents (default: %(default)s)')
+    parser.add_argument('--repeat', type=int, default=3, help='loads of each kind, the best time is reported (default: %(default)s)')
+    args = parser.parse_args()
+
+    selection = { }
+    for path in args.path.split(','):
+        selection = asfdata.add_selection(selection, path.split('.'))
+
+    sources = [ ]
+    for path in args.source:
+        with open(path, 'r') as f:
+            sources.append((path, f.read()))
+    if not args.source:
+        doc = generate(args.committees, args.seed)
+        sources.append(('generated.json', json.dumps(doc)))
+        sources.append(('generated.yaml', yaml.safe_dump(doc)))
+
+    print(f'selection: {selection}; ijson: {asfdata.ijson.backend if asfdata.ijson else "not installed"}')
+    print(f'{"source":<28} {"MB":>6} {"whole s":>9} {"select s":>9} {"whole MB":>9} {"select MB":>9}')
+    same = [ bench(name, content, selection, args.repeat) for name, content in sources ]
+    return 0 if all(same) else 1
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,173 @@
+#!/usr/bin/env python3
+#
+# Licensed to the Apache Software Foundation (ASF) under one
+# or more contributor license agreements.  See the NOTICE file
+# distributed with this work for additional information
+# regarding copyright ownership.  The ASF licenses this file
+# to you under the Apache License, Version 2.0 (the
+# "License"); you may not use this file except in compliance
+# with the License.  You may obtain a copy of the License at
+#
+#   http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing,
+# software distributed under the License is distributed on an
+# "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY
+# KIND, either express or implied.  See the License for the
+# specific language governing permissions and limitations
+# under the License.
+#
+#
+# benchparsers.py -- compare the ASF_HTML_PARSER choices
+#
+# Renders markdown pages with gfm, then runs the Beautiful Soup plugins
+# (asfgenid, toc and consensual_youtube) over each page once per parser.
+# Every page's output must be identical to the html.parser output; the
+# pages that differ are listed with a diff. The timings of the largest
+# pages show the per-page savings.
+#
+# USAGE:
+#   $ export LIBCMARKDIR=/path/to/cmark-gfm-0.28.3.gfm.12/lib
+#   $ ./benchparsers.py                       # a generated corpus
+#   $ ./benchparsers.py --content ../site/content --largest 20
+#
+
+import sys
+import os
+import argparse
+import contextlib
+import copy
+import difflib
+import io
+import random
+import time
+
+THIS_DIR = os.path.abspath(os.path.dirname(__file__))
+PLUGINS = os.path.join(THIS_DIR, os.pardir, 'plugins')
+sys.path.insert(0, PLUGINS)
+
+import benchreaders  # pylint: disable=wrong-import-position
+
+BASE_PARSER = 'html.parser'
+
+
+# the parts of a Pelican page that the plugins use
+class Page:
+    def __init__(self, path, html, settings):
+        self.relative_source_path = path
+        self.slug = os.path.splitext(os.path.basename(path))[0]
+        self._content = html
+        self.settings = settings
+        self.metadata = { 'title': self.slug }
+
+
+def load_pages(args):
+    import gfm
+
+    pages = [ ]
+    if args.content:
+        for root, _dirs, files in os.walk(args.content):
+            for name in sorted(files):
+                if name.endswith('.md'):
+                    path = os.path.join(root, name)
+                    with open(path, 'rb') as f:
+                        pages.append((os.path.relpath(path, args.content), f.read()))
+    else:
+        rng = random.Random(args.seed)
+        for n in range(args.pages):
+            # a few pages are much larger than the rest, as on real sites
+            big = copy.copy(args)
+            if n % 10 == 0:
+                big.headings *= 8
+            text = '[TOC]\n\n' + benchreaders.make_markdown(rng, big)
+            pages.append((f'page{n:05d}.md', text.encode('utf-8')))
+    return [ (path, gfm.render_gfm(text)[0]) for path, text in pages ]
+
+
+def make_settings(parser):
+    import asfgenid
+
+    return {
+        'ASF_HTML_PARSER': parser,
+        'ASF_GENID': dict(asfgenid.ASF_GENID),
+        # without the genid cache, so each run parses every page
+        'ASF_GENID_CACHE_DIR': None,
+        'TOC': { 'TOC_HEADERS': '^h[1-6]', 'TOC_RUN': 'true' },
+        'PLUGINS': [ ],
+        'PATH': '.',
+        'OUTPUT_PATH': '.',
+    }
+
+
+# run the plugins over one page, returning its html and the seconds taken
+def transform(path, html, settings):
+    import asfgenid
+    import consensual_youtube
+    import toc
+
+    page = Page(path, html, settings)
+    start = time.perf_counter()
+    with contextlib.redirect_stdout(io.StringIO()):
+        asfgenid.generate_id(page)
+        toc.generate_toc(page)
+        consensual_youtube.generate_youtube(page)
+    return page._content, time.perf_counter() - start  # pylint: disable=protected-access
+
+
+def main():
+    import asfhtml
+
+    parser = argparse.ArgumentParser(description='Compare the html parsers of the Beautiful Soup plugins.')
+    parser.add_argument('--content', help='directory of markdown pages (default: a generated corpus)')
+    parser.add_argument('--pages', type=int, default=200, help='pages in a generated corpus (default: %(default)s)')
+    parser.add_argument('--headings', type=int, default=8, help='headings per generated page (default: %(default)s)')
+    parser.add_argument('--paragraphs', type=int, default=3, help='paragraphs per heading (default: %(default)s)')
+    parser.add_argument('--tables', type=int, default=2, help='tables per generated page (default: %(default)s)')
+    parser.add_argument('--table-rows', type=int, default=20, help='rows per table (default: %(default)s)')
+    parser.add_argument('--seed', type=int, default=1, help='random seed for the corpus (default: %(default)s)')
+    parser.add_argument('--parsers', default=asfhtml.DEFAULT_PARSER,
+                        help='comma-separated parsers to compare with html.parser (default: %(default)s)')
+    parser.add_argument('--repeat', type=int, default=3, help='runs per page, the fastest counts (default: %(default)s)')
+    parser.add_argument('--largest', type=int, default=10, help='largest pages to show (default: %(default)s)')
+    parser.add_argument('--diffs', type=int, default=3, help='differing pages to show a diff for (default: %(default)s)')
+    args = parser.parse_args()
+
+    pages = load_pages(args)
+    parsers = [ BASE_PARSER ] + [ p for p in args.parsers.split(',') if p != BASE_PARSER ]
+    print(f'{len(pages)} pages, parsers: {", ".join(parsers)}')
+
+    # parser -> list of (html, seconds), in page order
+    results = { }
+    for name in parsers:
+        settings = make_settings(name)
+        results[name] = [ ]
+        for path, html in pages:
+            runs = [ transform(path, html, settings) for _ in range(args.repeat) ]
+            results[name].append((runs[0][0], min(secs for _html, secs in runs)))
+
+    failed = False
+    for name in parsers[1:]:
+        differ = [ i for i, (html, _secs) in enumerate(results[name]) if html != results[BASE_PARSER][i][0] ]
+        total = sum(secs for _html, secs in results[name])
+        base = sum(secs for _html, secs in results[BASE_PARSER])
+        print(f'{name}: {len(pages) - len(differ)} of {len(pages)} pages identical, '
+              f'{total:.2f}s vs {base:.2f}s ({(1 - total / base) * 100:+.1f}% saved)')
+        for i in differ[:args.diffs]:
+            print(f'--- {pages[i][0]}')
+            sys.stdout.writelines(difflib.unified_diff(results[BASE_PARSER][i][0].splitlines(True),
+                                                       results[name][i][0].splitlines(True),
+                                                       BASE_PARSER, name, n=1))
+        failed = failed or bool(differ)
+
+    print(f'\n{"page":30} {"KB":>7}' + ''.join(f' {p + " ms":>15}' for p in parsers))
+    largest = sorted(range(len(pages)), key=lambda i: len(pages[i][1]), reverse=True)[:args.largest]
+    for i in largest:
+        line = f'{pages[i][0][-30:]:30} {len(pages[i][1]) / 1024:7.1f}'
+        line += ''.join(f' {results[p][i][1] * 1000:15.2f}' for p in parsers)
+        print(line)
+
+    return 1 if failed else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,154 @@
+#!/usr/bin/env python3
+#
+# Licensed to the Apache Software Foundation (ASF) under one
+# or more contributor license agreements.  See the NOTICE file
+# distributed with this work for additional information
+# regarding copyright ownership.  The ASF licenses this file
+# to you under the Apache License, Version 2.0 (the
+# "License"); you may not use this file except in compliance
+# with the License.  You may obtain a copy of the License at
+#
+#   http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing,
+# software distributed under the License is distributed on an
+# "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY
+# KIND, either express or implied.  See the License for the
+# specific language governing permissions and limitations
+# under the License.
+#
+#
+# benchpool.py -- measure the asfpool plugin on the benchmark corpus
+#
+# Generates the corpus of benchreaders.py, builds it with Pelican once
+# serially and once per ASF_PAGE_WORKERS value, and reports the build
+# times and the speedup. Every build must write the same files as the
+# serial build; the files that differ are listed.
+#
+# USAGE:
+#   $ export LIBCMARKDIR=/path/to/cmark-gfm-0.28.3.gfm.12/lib
+#   $ ./benchpool.py --pages 2000 --workers 4,8,16
+#
+
+import sys
+import os
+import argparse
+import filecmp
+import multiprocessing
+import tempfile
+import time
+
+THIS_DIR = os.path.abspath(os.path.dirname(__file__))
+PLUGINS = os.path.join(THIS_DIR, os.pardir, 'plugins')
+sys.path.insert(0, THIS_DIR)
+
+import benchreaders  # pylint: disable=wrong-import-position
+
+
+def make_settings(content_dir, output_dir, workers):
+    import pelican.settings
+
+    return pelican.settings.read_settings(override={
+        'PATH': content_dir,
+        'OUTPUT_PATH': output_dir,
+        'THEME': 'simple',
+        'SITEURL': 'https://bench.apache.org',
+        'TIMEZONE': 'UTC',
+        'PAGE_PATHS': [ 'pages' ],
+        'ARTICLE_PATHS': [ 'blog' ],
+        # the .md and .ezmd page of the same name are written apart
+        'PATH_METADATA': 'pages/(?P<path_no_ext>.*)',
+        'PAGE_SAVE_AS': '{path_no_ext}.html',
+        'READERS': { 'html': None },
+        'FEED_ALL_ATOM': None,
+        'PLUGIN_PATHS': [ PLUGINS ],
+        'PLUGINS': [ 'gfm', 'asfgenid', 'asfreader', 'toc', 'asfpool' ],
+        # without render caches, so each run does all of the work
+        'GFM_CACHE_DIR': None,
+        'ASF_GENID_CACHE_DIR': None,
+        'ASF_PAGE_WORKERS': workers,
+        'ASF_DATA': {
+            'metadata': {
+                'site_name': 'Benchmark',
+                # ezt sequences are objects with attributes, as asfdata creates them
+                'projects': [ type('projects', (), { 'name': f'Project {p}', 'description': 'A project' })
+                              for p in range(50) ],
+            },
+            'debug': False,
+        },
+    })
+
+
+# build the site once. Runs in a child process.
+def build(content_dir, output_dir, workers):
+    import pelican
+
+    site = pelican.Pelican(make_settings(content_dir, output_dir, workers))
+    devnull = open(os.devnull, 'w')
+    stdout = sys.stdout
+    start = time.perf_counter()
+    try:
+        # the plugins report every page; keep that out of the results
+        sys.stdout = devnull
+        site.run()
+    finally:
+        sys.stdout = stdout
+        devnull.close()
+    return time.perf_counter() - start
+
+
+def run_isolated(content_dir, output_dir, workers):
+    ctx = multiprocessing.get_context('spawn')
+    with ctx.Pool(1) as pool:
+        return pool.apply(build, (content_dir, output_dir, workers))
+
+
+# the files that differ between two output trees
+def compare(left, right):
+    differ = [ ]
+    cmp = filecmp.dircmp(left, right)
+    stack = [ ('', cmp) ]
+    while stack:
+        prefix, cmp = stack.pop()
+        differ.extend(os.path.join(prefix, name) for name in cmp.left_only + cmp.right_only + cmp.diff_files)
+        stack.extend((os.path.join(prefix, name), sub) for name, sub in cmp.subdirs.items())
+    return sorted(differ)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark the asfpool plugin against a serial build.')
+    parser.add_argument('--pages', type=int, default=500, help='pages per corpus (default: %(default)s)')
+    parser.add_argument('--headings', type=int, default=8, help='headings per page (default: %(default)s)')
+    parser.add_argument('--paragraphs', type=int, default=3, help='paragraphs per heading (default: %(default)s)')
+    parser.add_argument('--tables', type=int, default=2, help='tables per page (default: %(default)s)')
+    parser.add_argument('--table-rows', type=int, default=20, help='rows per table (default: %(default)s)')
+    parser.add_argument('--metadata', type=int, default=5, help='extra metadata header lines per page (default: %(default)s)')
+    parser.add_argument('--seed', type=int, default=1, help='random seed for the corpus (default: %(default)s)')
+    parser.add_argument('--workers', default=str(os.cpu_count() or 1),
+                        help='comma-separated ASF_PAGE_WORKERS to compare with a serial build (default: %(default)s)')
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmpdir:
+        content_dir = os.path.join(tmpdir, 'content')
+        print(f'Generating {args.pages} pages per corpus in {content_dir}')
+        benchreaders.generate_corpus(content_dir, args)
+
+        serial_dir = os.path.join(tmpdir, 'serial')
+        serial = run_isolated(content_dir, serial_dir, 0)
+        print(f'{"workers":>8} {"seconds":>9} {"speedup":>8}  output')
+        print(f'{"serial":>8} {serial:9.2f} {1:8.2f}x')
+
+        failed = False
+        for workers in [ int(w) for w in args.workers.split(',') ]:
+            output_dir = os.path.join(tmpdir, f'workers{workers}')
+            seconds = run_isolated(content_dir, output_dir, workers)
+            differ = compare(serial_dir, output_dir)
+            result = 'identical' if not differ else f'{len(differ)} files differ: {" ".join(differ[:5])}'
+            print(f'{workers:8d} {seconds:9.2f} {serial / seconds:8.2f}x  {result}')
+            failed = failed or bool(differ)
+
+    return 1 if failed else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
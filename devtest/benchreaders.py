@@ -0,0 +1,266 @@
+#!/usr/bin/env python3
+#
+# Licensed to the Apache Software Foundation (ASF) under one
+# or more contributor license agreements.  See the NOTICE file
+# distributed with this work for additional information
+# regarding copyright ownership.  The ASF licenses this file
+# to you under the Apache License, Version 2.0 (the
+# "License"); you may not use this file except in compliance
+# with the License.  You may obtain a copy of the License at
+#
+#   http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing,
+# software distributed under the License is distributed on an
+# "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY
+# KIND, either express or implied.  See the License for the
+# specific language governing permissions and limitations
+# under the License.
+#
+#
+# benchreaders.py -- measure the throughput of the Pelican readers
+#
+# Generates a synthetic corpus of markdown and ezmd pages, then reads
+# every page with each reader and reports pages/sec, p50/p99 per-page
+# latency and peak RSS. Each reader runs in its own process, so that
+# the peak RSS belongs to that reader alone.
+#
+# USAGE:
+#   $ export LIBCMARKDIR=/path/to/cmark-gfm-0.28.3.gfm.12/lib
+#   $ ./benchreaders.py --pages 2000 --json results.json
+#   $ ./benchreaders.py --pages 2000 --baseline results.json
+#
+
+import sys
+import os
+import argparse
+import json
+import multiprocessing
+import random
+import resource
+import tempfile
+import time
+
+THIS_DIR = os.path.abspath(os.path.dirname(__file__))
+PLUGINS = os.path.join(THIS_DIR, os.pardir, 'plugins')
+sys.path.insert(0, PLUGINS)
+
+# reader name -> (module, class, extension of its corpus)
+READERS = {
+    'gfm': ('gfm', 'GFMReader', 'md'),
+    'asf': ('asfreader', 'ASFReader', 'ezmd'),
+    'jinja-md': ('jinja2content', 'JinjaMarkdownReader', 'md'),
+    'jinja-html': ('jinja2content', 'JinjaHTMLReader', 'html'),
+}
+
+WORDS = ('apache software foundation project release download mirror '
+         'committer community vote board podling incubator license').split()
+
+
+def sentence(rng, count):
+    return ' '.join(rng.choice(WORDS) for _ in range(count)).capitalize() + '.'
+
+
+def make_table(rng, rows, cols):
+    lines = [ '| ' + ' | '.join(f'Col {c}' for c in range(cols)) + ' |',
+              '|' + '---|' * cols ]
+    for _ in range(rows):
+        lines.append('| ' + ' | '.join(rng.choice(WORDS) for _ in range(cols)) + ' |')
+    return '\n'.join(lines)
+
+
+# generate the body of one markdown page
+def make_markdown(rng, args):
+    parts = [ ]
+    for h in range(args.headings):
+        level = 2 + h % 3
+        parts.append('#' * level + ' ' + sentence(rng, 3))
+        for _ in range(args.paragraphs):
+            parts.append(sentence(rng, 40))
+        if h < args.tables:
+            parts.append(make_table(rng, args.table_rows, 4))
+    return '\n\n'.join(parts) + '\n'
+
+
+def make_header(rng, args, n):
+    lines = [ f'Title: Page {n}' ]
+    for m in range(args.metadata):
+        lines.append(f'Meta{m}: {sentence(rng, 5)}')
+    return '\n'.join(lines) + '\n\n'
+
+
+# ezmd pages add ezt directives and asfdata references to the markdown
+def make_ezmd(rng, args, n):
+    return (make_header(rng, args, n)
+            + '[{ site_name }]\n\n'
+            + make_markdown(rng, args)
+            + '\n[for projects]* [projects.name] - [projects.description]\n[end]\n')
+
+
+# html pages for the JinjaHTMLReader
+def make_html(rng, args, n):
+    body = [ ]
+    for _ in range(args.headings):
+        body.append(f'<h2>{sentence(rng, 3)}</h2>')
+        body.extend(f'<p>{sentence(rng, 40)}</p>' for _ in range(args.paragraphs))
+    meta = ''.join(f'<meta name="meta{m}" content="{sentence(rng, 5)}">' for m in range(args.metadata))
+    return f'<html><head><title>Page {n}</title>{meta}</head><body>{"".join(body)}</body></html>\n'
+
+
+def generate_corpus(content_dir, args):
+    rng = random.Random(args.seed)
+    pages = os.path.join(content_dir, 'pages')
+    os.makedirs(pages, exist_ok=True)
+    for n in range(args.pages):
+        with open(os.path.join(pages, f'page{n:05d}.md'), 'w') as f:
+            f.write(make_header(rng, args, n) + make_markdown(rng, args))
+        with open(os.path.join(pages, f'page{n:05d}.ezmd'), 'w') as f:
+            f.write(make_ezmd(rng, args, n))
+        with open(os.path.join(pages, f'page{n:05d}.html'), 'w') as f:
+            f.write(make_html(rng, args, n))
+
+
+def make_settings(content_dir, args):
+    import pelican.settings
+
+    settings = pelican.settings.read_settings(override={
+        'PATH': content_dir,
+        'THEME': 'simple',
+        'SITEURL': 'https://bench.apache.org',
+        'TIMEZONE': 'UTC',
+        'GFM_CACHE_DIR': args.cache,
+        'GFM_RENDER_WORKERS': 0,
+        'ASF_DATA': {
+            'metadata': {
+                'site_name': 'Benchmark',
+                # ezt sequences are objects with attributes, as asfdata creates them
+                'projects': [ type('projects', (), { 'name': f'Project {p}', 'description': 'A project' })
+                              for p in range(50) ],
+            },
+            'debug': False,
+        },
+    })
+    return settings
+
+
+def peak_rss_kb():
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    if sys.platform == 'darwin':
+        rss //= 1024  # bytes on macOS
+    return rss
+
+
+def percentile(ordered, pct):
+    return ordered[min(len(ordered) - 1, int(len(ordered) * pct / 100))]
+
+
+# read every page of the corpus with one reader. Runs in a child process.
+def bench_reader(name, content_dir, args):
+    module_name, class_name, extension = READERS[name]
+    module = __import__(module_name)
+    reader = getattr(module, class_name)(make_settings(content_dir, args))
+
+    pages = os.path.join(content_dir, 'pages')
+    paths = sorted(os.path.join(pages, f) for f in os.listdir(pages) if f.endswith('.' + extension))
+
+    # ASFReader reports every ezt data reference; keep that out of the results
+    devnull = open(os.devnull, 'w')
+    stdout = sys.stdout
+    latencies = [ ]
+    start = time.perf_counter()
+    try:
+        sys.stdout = devnull
+        for path in paths:
+            t0 = time.perf_counter()
+            reader.read(path)
+            latencies.append(time.perf_counter() - t0)
+    finally:
+        sys.stdout = stdout
+        devnull.close()
+    elapsed = time.perf_counter() - start
+
+    latencies.sort()
+    return {
+        'pages': len(paths),
+        'seconds': elapsed,
+        'pages_per_sec': len(paths) / elapsed,
+        'p50_ms': percentile(latencies, 50) * 1000,
+        'p99_ms': percentile(latencies, 99) * 1000,
+        'peak_rss_kb': peak_rss_kb(),
+    }
+
+
+# run bench_reader() in a fresh process, so peak RSS is per reader
+def run_isolated(name, content_dir, args):
+    ctx = multiprocessing.get_context('spawn')
+    with ctx.Pool(1) as pool:
+        return pool.apply(bench_reader, (name, content_dir, args))
+
+
+def available(name):
+    module_name, class_name, _extension = READERS[name]
+    try:
+        module = __import__(module_name)
+    except ImportError as e:
+        return str(e)
+    if not getattr(module, class_name).enabled:
+        return f'{class_name} is not enabled'
+    return None
+
+
+def report(results, baseline):
+    print(f'{"reader":12} {"pages/s":>10} {"p50 ms":>9} {"p99 ms":>9} {"peak RSS":>10}')
+    for name, r in results.items():
+        line = (f'{name:12} {r["pages_per_sec"]:10.1f} {r["p50_ms"]:9.3f} '
+                f'{r["p99_ms"]:9.3f} {r["peak_rss_kb"] // 1024:8d}MB')
+        old = baseline.get(name)
+        if old:
+            change = (r['pages_per_sec'] / old['pages_per_sec'] - 1) * 100
+            line += f'  {change:+.1f}% pages/s vs baseline'
+        print(line)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark the gfm, asfreader and jinja2content readers.')
+    parser.add_argument('--pages', type=int, default=500, help='pages per corpus (default: %(default)s)')
+    parser.add_argument('--headings', type=int, default=8, help='headings per page (default: %(default)s)')
+    parser.add_argument('--paragraphs', type=int, default=3, help='paragraphs per heading (default: %(default)s)')
+    parser.add_argument('--tables', type=int, default=2, help='tables per page (default: %(default)s)')
+    parser.add_argument('--table-rows', type=int, default=20, help='rows per table (default: %(default)s)')
+    parser.add_argument('--metadata', type=int, default=5, help='extra metadata header lines per page (default: %(default)s)')
+    parser.add_argument('--seed', type=int, default=1, help='random seed for the corpus (default: %(default)s)')
+    parser.add_argument('--readers', default=','.join(READERS), help='comma-separated readers to run (default: %(default)s)')
+    parser.add_argument('--cache', help='GFM_CACHE_DIR to use (default: no render cache)')
+    parser.add_argument('--corpus', help='directory to generate the corpus in (default: a temporary directory)')
+    parser.add_argument('--json', help='write the results as JSON to this file')
+    parser.add_argument('--baseline', help='compare with the results in this JSON file')
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmpdir:
+        content_dir = os.path.abspath(args.corpus or tmpdir)
+        print(f'Generating {args.pages} pages per corpus in {content_dir}')
+        generate_corpus(content_dir, args)
+
+        results = { }
+        for name in args.readers.split(','):
+            reason = available(name)
+            if reason:
+                print(f'Skipping {name}: {reason}')
+                continue
+            results[name] = run_isolated(name, content_dir, args)
+
+    baseline = { }
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)['results']
+    report(results, baseline)
+
+    if args.json:
+        corpus = {k: getattr(args, k) for k in ('pages', 'headings', 'paragraphs', 'tables', 'table_rows', 'metadata', 'seed')}
+        with open(args.json, 'w') as f:
+            json.dump({ 'python': sys.version.split()[0], 'corpus': corpus, 'results': results }, f, indent=2)
+        print(f'Results written to {args.json}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,224 @@
+#!/usr/bin/env python3
+#
+# Licensed to the Apache Software Foundation (ASF) under one
+# or more contributor license agreements.  See the NOTICE file
+# distributed with this work for additional information
+# regarding copyright ownership.  The ASF licenses this file
+# to you under the Apache License, Version 2.0 (the
+# "License"); you may not use this file except in compliance
+# with the License.  You may obtain a copy of the License at
+#
+#   http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing,
+# software distributed under the License is distributed on an
+# "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY
+# KIND, either express or implied.  See the License for the
+# specific language governing permissions and limitations
+# under the License.
+#
+#
+# benchsvnls.py -- measure the svn ls -Rv parser of asfdata
+#
+# Parses svn ls -Rv listings with the ReleaseListing of asfdata and with
+# the line-splitting, strptime-based loop it replaced, checks that both
+# give the same KEYS url and distributions, and reports lines per second.
+#
+# The listings are the fixtures in devtest/fixtures (svnls-*.txt), any
+# files given with --listing, and a generated listing of --lines lines in
+# the format of svn ls -Rv. Record a real listing with
+#
+#   $ svn ls -Rv https://dist.apache.org/repos/dist/release/PROJECT > fixtures/svnls-PROJECT.txt
+#
+# USAGE:
+#   $ ./benchsvnls.py
+#   $ ./benchsvnls.py --lines 200000 --listing /tmp/svnls-commons.txt
+#
+
+import sys
+import os
+import argparse
+import datetime
+import glob
+import random
+import re
+import time
+import traceback
+
+THIS_DIR = os.path.abspath(os.path.dirname(__file__))
+PLUGINS = os.path.join(THIS_DIR, os.pardir, 'plugins')
+FIXTURES = os.path.join(THIS_DIR, 'fixtures')
+sys.path.insert(0, PLUGINS)
+
+import asfdata  # pylint: disable=wrong-import-position
+
+# svn ls -v prints each entry with "%7ld %-8.8s %c %10s %12s %s%s"
+SVN_LINE = '{revision:7d} {author:<8.8} {lock} {size:>10} {date:>12} {path}\n'
+
+
+# the parser that ReleaseListing replaced, as it was in process_distributions
+def legacy_listing(lines, project, src, sort_revision, gatherDate):
+    gatherYear = gatherDate.year
+    signatures = {}
+    checksums = {}
+    fsizes = {}
+    dtms = {}
+    versions = {}
+    revisions = {}
+    keys = None
+    for line in lines:
+        line = line.strip()
+        listing = line.split(' ')
+        if line[-1:] == '/':
+            continue
+        if sort_revision:
+            revision = int(listing[0])
+        else:
+            revision = 0
+        if listing[-6] == '':
+            dtm1 = datetime.datetime.strptime(" ".join(listing[-4:-2]) + " " + str(gatherYear), asfdata.SVN_DATE_FORMAT)
+            if dtm1 > gatherDate:
+                dtm1 = datetime.datetime.strptime(" ".join(listing[-4:-2]) + " " + str(gatherYear - 1),
+                                                  asfdata.SVN_DATE_FORMAT)
+            fsize = listing[-5]
+        else:
+            dtm1 = datetime.datetime.strptime(" ".join(listing[-5:-1]), asfdata.SVN_DATE_FORMAT)
+            fsize = listing[-6]
+        dtm = dtm1.strftime("%m/%d/%Y")
+        if float(fsize) > 524288:
+            fsize = ('%.2f' % asfdata.bytesto(fsize, 'm')) + ' MB'
+        else:
+            fsize = ('%.2f' % asfdata.bytesto(fsize, 'k')) + ' KB'
+        line = listing[-1]
+        fields = line.split('/')
+        filename = fields[-1]
+        parts = line.split('.')
+        release = line
+        if filename:
+            if re.search('KEYS(\\.txt)?$', filename):
+                keys = f'https://downloads.apache.org/{project}/{line}'
+            elif re.search('\\.(asc|sig)$', filename, flags=re.IGNORECASE):
+                release = '.'.join(parts[:-1])
+                signatures[release] = filename
+                versions[release] = '/'.join(fields[:-1])
+                revisions[release] = revision
+                if re.search(src, filename):
+                    revisions[release] = revision + 100000
+            elif re.search('\\.(sha512|sha1|sha256|sha|md5|mds)$', filename, flags=re.IGNORECASE):
+                part0 = ".".join(line.split('.')[-2:-1])
+                if part0 == "asc":
+                    continue
+                release = '.'.join(parts[:-1])
+                checksums[release] = filename
+            else:
+                fsizes[release] = fsize
+                dtms[release] = dtm
+
+    each_version = {}
+    for rel in signatures:
+        version = versions[rel]
+        if version not in each_version:
+            each_version[version] = []
+        release = rel[len(version) + 1:]
+        try:
+            each_version[version].append(asfdata.Distribution(release=release,
+                                                              revision=revisions[rel],
+                                                              signature=signatures[rel],
+                                                              checksum=checksums[rel],
+                                                              dtm=dtms[rel],
+                                                              fsize=fsizes[rel]))
+        except Exception:
+            traceback.print_exc()
+    distributions = []
+    for version in each_version:
+        each_version[version].sort(key=lambda x: (-x.revision, x.release))
+        distributions.append(asfdata.Version(version=version,
+                                             name=' '.join(version.split('/')),
+                                             revision=each_version[version][0].revision,
+                                             release=each_version[version]))
+    distributions.sort(key=lambda x: (-x.revision, x.version))
+    return keys, distributions
+
+
+def new_listing(lines, project, src, sort_revision, today):
+    listing = asfdata.ReleaseListing(project, src, sort_revision, today).parse(lines)
+    return listing.keys, listing.distributions()
+
+
+# the result of a parser as plain values
+def flatten(result):
+    keys, distributions = result
+    return keys, [ (v.version, v.name, v.revision, [ sorted(vars(d).items()) for d in v.release ])
+                   for v in distributions ]
+
+
+# a listing in the format of svn ls -Rv, for a project with many releases
+def generate(lines, seed, today):
+    r = random.Random(seed)
+    out = [ SVN_LINE.format(revision=r.randint(1000, 90000), author='sebb', lock=' ', size='',
+                            date='Jan 05  2021', path='./'),
+            SVN_LINE.format(revision=r.randint(1000, 90000), author='sebb', lock=' ', size=r.randint(1000, 900000),
+                            date='Jan 05  2021', path='KEYS') ]
+    version = 0
+    while len(out) < lines:
+        version += 1
+        component = r.choice([ 'core', 'tools', 'plugins/extra' ])
+        directory = f'{component}/{version // 10}.{version % 10}.0'
+        out.append(SVN_LINE.format(revision=r.randint(1000, 90000), author='jdoe', lock=' ', size='',
+                                   date='Mar 12  2019', path=f'{directory}/'))
+        for kind in [ 'src.tar.gz', 'src.zip', 'bin.tar.gz', 'bin.zip' ]:
+            revision = r.randint(1000, 1900000)
+            size = r.randint(1000, 900000000)
+            when = today - datetime.timedelta(days=r.randint(0, 2000))
+            if (today - when).days < 180:
+                date = when.strftime('%b %d %H:%M')
+            else:
+                date = when.strftime('%b %d  %Y')
+            name = f'{directory}/project-{component.replace("/", "-")}-{version}-{kind}'
+            for ext, ext_size in [ ('', size), ('.asc', 833), ('.sha512', 170), ('.asc.sha512', 170) ]:
+                out.append(SVN_LINE.format(revision=revision, author=r.choice([ 'jdoe', 'someone-long' ]),
+                                           lock=' ', size=ext_size, date=date, path=name + ext))
+    return out[:lines]
+
+
+def bench(name, lines, today, repeat):
+    args = ('project', '-src', True)
+    legacy = flatten(legacy_listing(lines, *args, today))
+    new = flatten(new_listing(lines, *args, today))
+    timings = [ ]
+    for parse in (legacy_listing, new_listing):
+        best = None
+        for _ in range(repeat):
+            start = time.perf_counter()
+            parse(lines, *args, today)
+            elapsed = time.perf_counter() - start
+            best = elapsed if best is None else min(best, elapsed)
+        timings.append(len(lines) / best)
+    result = 'identical' if legacy == new else 'DIFFERENT'
+    print(f'{name:<32} {len(lines):>8} {timings[0]:>12,.0f} {timings[1]:>12,.0f} {timings[1] / timings[0]:>7.1f}x  {result}')
+    return legacy == new
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark the svn ls -Rv parser of asfdata.')
+    parser.add_argument('--listing', action='append', default=[ ], help='a recorded svn ls -Rv listing (repeatable)')
+    parser.add_argument('--lines', type=int, default=100000, help='lines of the generated listing (default: %(default)s)')
+    parser.add_argument('--seed', type=int, default=1, help='random seed for the generated listing (default: %(default)s)')
+    parser.add_argument('--repeat', type=int, default=3, help='runs per parser, the best is reported (default: %(default)s)')
+    args = parser.parse_args()
+
+    # the fixtures were listed on this day
+    today = datetime.datetime(2024, 6, 1, 12, 0)
+    listings = [ ]
+    for path in sorted(glob.glob(os.path.join(FIXTURES, 'svnls-*.txt'))) + args.listing:
+        with open(path, 'r') as f:
+            listings.append((os.path.basename(path), f.readlines()))
+    listings.append((f'generated (seed {args.seed})', generate(args.lines, args.seed, today)))
+
+    print(f'{"listing":<32} {"lines":>8} {"before l/s":>12} {"after l/s":>12} {"speedup":>8}')
+    same = [ bench(name, lines, today, args.repeat) for name, lines in listings ]
+    return 0 if all(same) else 1
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,134 @@
+#!/usr/bin/python -B
+#
+# Licensed to the Apache Software Foundation (ASF) under one
+# or more contributor license agreements.  See the NOTICE file
+# distributed with this work for additional information
+# regarding copyright ownership.  The ASF licenses this file
+# to you under the Apache License, Version 2.0 (the
+# "License"); you may not use this file except in compliance
+# with the License.  You may obtain a copy of the License at
+#
+#   http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing,
+# software distributed under the License is distributed on an
+# "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY
+# KIND, either express or implied.  See the License for the
+# specific language governing permissions and limitations
+# under the License.
+#
+# asfcache.py -- on-disk caches shared by the plugins
+#
+# This is not a Pelican plugin. gfm caches rendered markdown with it,
+# asfgenid caches transformed html and asfdata caches HTTP responses.
+#
+
+import os
+import json
+import tempfile
+import threading
+
+
+class DiskCache(object):
+    """Cache of JSON values, keyed by a hex digest.
+
+    Each entry is one file, <dir>/<key[:2]>/<key[2:]>, so a lookup is a
+    single open(). Hits touch the file; when the cache grows beyond its
+    size the least recently used entries are removed.
+
+    The directories are created private to the user. A cache directory
+    that belongs to another user, or that others can write to, is not
+    used: its entries could have been planted.
+    """
+
+    def __init__(self, path, size, name='cache'):
+        self.path = path
+        self.size = size
+        self.name = name  # for messages
+        self.count = None  # counted on first store
+        self.lock = threading.Lock()  # for count
+        self.usable = self.check_dir()
+
+    def check_dir(self):
+        try:
+            os.makedirs(self.path, mode=0o700, exist_ok=True)
+            st = os.stat(self.path)
+        except OSError as e:
+            print(f'WARNING: {self.name}: cannot create {self.path}: {e}')
+            return False
+        getuid = getattr(os, 'getuid', None)  # not on Windows
+        if getuid and (st.st_uid != getuid() or st.st_mode & 0o022):
+            print(f'WARNING: {self.name}: {self.path} is not private to this user; not using the cache')
+            return False
+        return True
+
+    def entry(self, key):
+        return os.path.join(self.path, key[:2], key[2:])
+
+    def load(self, key):
+        "Return the value stored under key, or None."
+        if not self.usable:
+            return None
+        fname = self.entry(key)
+        try:
+            with open(fname, 'r', encoding='utf-8') as f:
+                value = json.load(f)
+            os.utime(fname)
+        except (OSError, ValueError):
+            return None
+        return value
+
+    def store(self, key, value):
+        if not self.usable:
+            return
+        fname = self.entry(key)
+        try:
+            os.makedirs(os.path.dirname(fname), mode=0o700, exist_ok=True)
+            # write then rename, so concurrent builds and threads never see a partial entry
+            fd, tmpname = tempfile.mkstemp(dir=os.path.dirname(fname), prefix=os.path.basename(fname), suffix='.tmp')
+            try:
+                with open(fd, 'w', encoding='utf-8') as f:
+                    json.dump(value, f)
+                os.replace(tmpname, fname)
+            except BaseException:
+                os.remove(tmpname)
+                raise
+        except OSError as e:
+            print(f'WARNING: {self.name}: cannot write {fname}: {e}')
+            return
+        with self.lock:
+            if self.count is None:
+                self.count = len(self.entries())
+            else:
+                self.count += 1
+            if self.count > self.size:
+                self.prune()
+
+    # Other threads and builds add and remove entries meanwhile, so an
+    # entry that is gone is skipped.
+    def entries(self):
+        "Return (mtime, path) of each entry."
+        found = [ ]
+        try:
+            subs = [ sub.path for sub in os.scandir(self.path) if sub.is_dir() ]
+        except OSError:
+            return found
+        for sub in subs:
+            try:
+                for e in os.scandir(sub):
+                    if not e.name.endswith('.tmp'):
+                        found.append((e.stat().st_mtime, e.path))
+            except OSError:
+                continue
+        return found
+
+    def prune(self):
+        "Remove the least recently used entries, down to 90% of the cache size."
+        found = sorted(self.entries())
+        excess = len(found) - int(self.size * 0.9)
+        for _mtime, path in found[:max(excess, 0)]:
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+        self.count = len(found) - max(excess, 0)
@@ -23,10 +23,18 @@
 import os.path
 import sys
 import subprocess
+import concurrent.futures
+import copy
 import datetime
+import functools
+import gzip
+import hashlib
 import random
 import json
 import re
+import tempfile
+import threading
+import time
 import traceback
 import operator
 import pprint
@@ -43,6 +51,19 @@ import pelican.utils
 
 from bs4 import BeautifulSoup
 
+# ijson is optional. With it, a JSON source is parsed only where its
+# sequences select data; without it the whole source is parsed and the
+# rest is dropped.
+try:
+    import ijson
+except ImportError:
+    ijson = None
+
+# asfcache is not a plugin. It is a helper module next to this one.
+if os.path.dirname(os.path.abspath(__file__)) not in sys.path:
+    sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+import asfcache  # pylint: disable=wrong-import-position
+
 FIXUP_HTML = [
     (re.compile(r'&lt;'), '<'),
     (re.compile(r'&gt;'), '>'),
@@ -50,9 +71,67 @@ FIXUP_HTML = [
 
 REQUESTS_TIMEOUT = 5 # timeout for requests calls
 
+# Number of data sources that are fetched at the same time, while the
+# sources before them are processed. 0 or 1 fetches each source when it is
+# processed. Set with ASF_DATA_FETCH_WORKERS.
+ASF_DATA_FETCH_WORKERS = 8
+
+# The url, blog and eccn sources are cached on disk in ASF_DATA_CACHE_DIR
+# (None disables the cache), with their ETag and Last-Modified. A cached
+# source is revalidated with a conditional request, or not requested at
+# all while it is younger than the ttl: of its source in seconds. At most
+# ASF_DATA_CACHE_SIZE responses are kept.
+ASF_DATA_CACHE_DIR = os.path.join(tempfile.gettempdir(), 'asfdata-cache')
+ASF_DATA_CACHE_SIZE = 1000
+
+# The cache of this build, or None
+_HTTP_CACHE = None
+
+# How each cached source was answered: 'fresh', 'not modified' or 'downloaded'
+_HTTP_RESULTS: list = [ ]
+
+# Fetches started by prefetch(), by ('GET', url), ('text', url) or
+# ('release', project, src, revision)
+_FETCHES: dict = { }
+
+# The snapshot that the build records or replays, or None
+_SNAPSHOT = None
+
+# The svn directory of the projects' releases
+DIST_RELEASE = 'https://dist.apache.org/repos/dist/release'
+
+# The number of svn commands that run at the same time, when the release
+# keys are listed by prefetch(). Set with ASF_DATA_SVN_WORKERS.
+ASF_DATA_SVN_WORKERS = 4
+
+# Taken by each svn command
+_SVN_SLOTS = threading.BoundedSemaphore(ASF_DATA_SVN_WORKERS)
+
+# Where the logos of projects and podlings are
+LOGO_SITE = 'https://www.apache.org/'
+
+# How long the HTTP cache keeps the result of a logo check, in seconds
+ASF_DATA_LOGO_TTL = 24 * 60 * 60
+
+# The LogoChecks of this build
+_LOGO_CHECKS = None
+
+# The url and file sources loaded in this build, by ('url', url) or
+# ('file', path): [ data, times used ]
+_LOADS: dict = { }
+
 # Format of svn ls -v output: Jan 1 1970
 SVN_DATE_FORMAT = "%b %d %Y"
 
+# The months of svn ls -v output, by name
+MONTHS = { name: number for number, name in enumerate(('Jan', 'Feb', 'Mar', 'Apr', 'May', 'Jun',
+                                                       'Jul', 'Aug', 'Sep', 'Oct', 'Nov', 'Dec'), 1) }
+
+# The files of a release directory
+KEYS_RE = re.compile(r'KEYS(\.txt)?$')
+SIGNATURE_RE = re.compile(r'\.(asc|sig)$', re.IGNORECASE)
+CHECKSUM_RE = re.compile(r'\.(sha512|sha1|sha256|sha|md5|mds)$', re.IGNORECASE)
+
 # read the asfdata configuration in order to get data load and transformation instructions.
 def read_config(config_yaml, debug):
     with pelican.utils.pelican_open(config_yaml) as text:
@@ -63,30 +142,363 @@ def read_config(config_yaml, debug):
     return config_data
 
 
-# load yaml and json data sources.
-def load_data(path, content, debug):
+# The parts of a url or file source that the sequences of its blocks use,
+# as a tree of keys: { 'committees': { 'board': None }, 'officers': None }
+# selects committees.board and officers, where None is everything below
+# the key. None instead of a tree selects the whole source.
+def block_selection(value, selection):
+    for seq in value:
+        if seq in ('url', 'file', 'ttl'):
+            continue
+        sequence = value[seq]
+        if not isinstance(sequence, dict):
+            return None
+        if 'path' in sequence:
+            if not isinstance(sequence['path'], str):
+                return None
+            selection = add_selection(selection, sequence['path'].split('.'))
+        elif not ('dictionary' in sequence or 'sequence' in sequence) or \
+                any(action in sequence for action in ('where', 'trim', 'asfid', 'alpha')):
+            # the sequence starts from the whole source
+            return None
+        if 'dictionary' in sequence:
+            if not isinstance(sequence['dictionary'], str):
+                return None
+            for path in sequence['dictionary'].split(','):
+                selection = add_selection(selection, [ path ])
+    return selection
+
+
+# add the path of parts to a selection
+def add_selection(selection, parts):
+    node = selection
+    for part in parts[:-1]:
+        if part in node and node[part] is None:
+            return selection
+        node = node.setdefault(part, { })
+    node[parts[-1]] = None
+    return selection
+
+
+# The selections of the url and file sources of the configuration, by
+# ('url', url) or ('file', path). A source used by several blocks selects
+# what all of them use.
+def source_selections(config_data):
+    selections = { }
+    for key, value in config_data.items():
+        if key in ('eccn', 'twitter') or not isinstance(value, dict):
+            continue
+        # the same order of precedence as read_data()
+        if 'blog' in value or 'release' in value:
+            continue
+        if 'url' in value:
+            source = ('url', value['url'])
+        elif 'file' in value:
+            source = ('file', value['file'])
+        else:
+            continue
+        selection = selections.get(source, { })
+        if selection is not None:
+            selections[source] = block_selection(value, selection)
+    return selections
+
+
+# The selected parts of the data, as dictionaries with only the selected
+# keys. Where the selection continues into a value that is not a
+# dictionary, all of the value is kept.
+def select_data(data, selection):
+    if selection is None or not isinstance(data, dict):
+        return data
+    return { key: select_data(data[key], selection[key]) for key in data if key in selection }
+
+
+# Raised when a selection cannot be streamed; the source is loaded whole.
+class LoadWhole(Exception):
+    pass
+
+
+# The value that starts with the start event, built from the events of
+# ijson that follow it up to its end.
+def build_json(events, start):
+    builder = ijson.ObjectBuilder()
+    builder.event(start, None)
+    depth = 1
+    for _prefix, event, value in events:
+        if event in ('start_map', 'start_array'):
+            depth += 1
+        elif event in ('end_map', 'end_array'):
+            depth -= 1
+            if not depth:
+                break
+        builder.event(event, value)
+    return builder.value
+
+
+# The prefixes and values of the selected paths, from the events of ijson
+def select_json(events, paths):
+    for prefix, event, value in events:
+        if prefix in paths:
+            if event in ('start_map', 'start_array'):
+                value = build_json(events, event)
+            yield prefix, value
+
+
+# The selection of a JSON document, in one pass over the events of ijson.
+# The values of the selected paths are built, everything else is skipped.
+def stream_json(content, selection):
+    if isinstance(content, str):
+        content = content.encode('utf-8')
+    if not content.lstrip().startswith(b'{'):
+        raise LoadWhole('not an object')
+    # the selected paths by their ijson prefix
+    paths = { }
+    stack = [ ([ ], selection) ]
+    while stack:
+        parts, node = stack.pop()
+        for key, sub in node.items():
+            # ijson prefixes join the keys with '.', and call array items 'item'
+            if '.' in key or key == 'item':
+                raise LoadWhole(key)
+            if sub is None:
+                paths['.'.join(parts + [ key ])] = parts + [ key ]
+            else:
+                stack.append((parts + [ key ], sub))
+    if len(paths) == 1:
+        # the values of one path are built by the parser of ijson
+        prefix = next(iter(paths))
+        values = ((prefix, value) for value in ijson.items(content, prefix, use_float=True))
+    else:
+        # smaller reads than the default keep fewer events in memory at once
+        values = select_json(ijson.parse(content, use_float=True, buf_size=16384), paths)
+    load = { }
+    for prefix, value in values:
+        *parts, key = paths[prefix]
+        target = load
+        for part in parts:
+            target = target.setdefault(part, { })
+        # like json.loads, the last of duplicate keys wins
+        target[key] = value
+    return load
+
+
+# A yaml.SafeLoader that composes and constructs only the selected nodes
+# of a document, and skips the events of the others.
+class SelectLoader(yaml.SafeLoader):  # pylint: disable=too-many-ancestors
+    def load_selection(self, selection):
+        self.get_event()  # StreamStartEvent
+        if self.check_event(yaml.StreamEndEvent):
+            return None
+        self.get_event()  # DocumentStartEvent
+        load = self.select_node(selection)
+        self.get_event()  # DocumentEndEvent
+        if not self.check_event(yaml.StreamEndEvent):
+            raise LoadWhole('more than one document')
+        return load
+
+    def select_node(self, selection):
+        event = self.peek_event()
+        if selection is None or not isinstance(event, yaml.MappingStartEvent) or event.anchor or \
+                event.tag not in (None, '!', yaml.resolver.BaseResolver.DEFAULT_MAPPING_TAG):
+            return self.construct_document(self.compose_node(None, None))
+        self.get_event()
+        load = { }
+        while not self.check_event(yaml.MappingEndEvent):
+            key_node = self.compose_node(None, None)
+            if key_node.tag == 'tag:yaml.org,2002:merge':
+                raise LoadWhole('merge key')
+            key = self.construct_document(key_node)
+            try:
+                selected = key in selection
+            except TypeError:
+                raise LoadWhole('unhashable key') from None
+            if selected:
+                load[key] = self.select_node(selection[key])
+            else:
+                self.skip_node()
+        self.get_event()
+        return load
+
+    # An anchor in a skipped node is not composed, so an alias to it in a
+    # selected node raises a ComposerError, and the source is loaded whole.
+    def skip_node(self):
+        depth = 0
+        while True:
+            event = self.get_event()
+            if isinstance(event, (yaml.MappingStartEvent, yaml.SequenceStartEvent)):
+                depth += 1
+            elif isinstance(event, (yaml.MappingEndEvent, yaml.SequenceEndEvent)):
+                depth -= 1
+            if depth == 0:
+                return
+
+
+def stream_yaml(content, selection):
+    loader = SelectLoader(content)
+    try:
+        return loader.load_selection(selection)
+    finally:
+        loader.dispose()
+
+
+# load yaml and json data sources. With a selection only the selected
+# parts are loaded.
+def load_data(path, content, debug, selection=None):
     parts = path.split('/')
     extension = os.path.splitext(parts[-1])[1]  # split off ext, keep ext
     if debug:
         print(f'Loading {extension} from {path}')
+    if selection is not None and extension in ('.json', '.yaml'):
+        if debug:
+            print(f'selecting {selection}')
+        try:
+            if extension == '.yaml':
+                return stream_yaml(content, selection)
+            if ijson:
+                return stream_json(content, selection)
+        except (LoadWhole, yaml.YAMLError, getattr(ijson, 'JSONError', LoadWhole)) as e:
+            if debug:
+                print(f'{path} is loaded whole: {e}')
     if extension == '.json':
         load = json.loads(content)
     elif extension == '.yaml':
         load = yaml.safe_load(content)
     else:
         load = { }
-    return load
+    return select_data(load, selection)
+
+
+# GET a url.
+def http_request(url, headers=None):
+    return requests.get(url, headers=headers, timeout=REQUESTS_TIMEOUT)
+
+
+# GET a url, or wait for the response that prefetch() started for it.
+def http_get(url, headers=None):
+    future = _FETCHES.get(('GET', url))
+    if future:
+        return future.result()
+    return http_request(url, headers)
+
+
+# GET the text at a url through the HTTP cache.
+def cached_text(url, ttl=0):
+    cache = _HTTP_CACHE
+    if not cache:
+        return http_request(url).text
+    key = hashlib.sha256(url.encode('utf-8')).hexdigest()
+    entry = cache.load(key)
+    if entry and entry['url'] != url:
+        entry = None
+    if entry and time.time() - entry['time'] < (ttl or 0):
+        _HTTP_RESULTS.append('fresh')
+        return entry['text']
+    headers = { }
+    if entry and entry['etag']:
+        headers['If-None-Match'] = entry['etag']
+    if entry and entry['last_modified']:
+        headers['If-Modified-Since'] = entry['last_modified']
+    try:
+        response = http_request(url, headers)
+    except requests.exceptions.RequestException as e:
+        if not entry:
+            raise
+        print(f'WARNING: {url}: {e}; using the copy cached at {time.ctime(entry["time"])}')
+        return entry['text']
+    if entry and response.status_code == 304:
+        _HTTP_RESULTS.append('not modified')
+        entry['time'] = time.time()
+        cache.store(key, entry)
+        return entry['text']
+    if response.status_code == 200:
+        _HTTP_RESULTS.append('downloaded')
+        cache.store(key, { 'url': url,
+                           'etag': response.headers.get('ETag'),
+                           'last_modified': response.headers.get('Last-Modified'),
+                           'time': time.time(),
+                           'text': response.text })
+    return response.text
+
+
+# the text at a url, from prefetch() or the HTTP cache
+def url_text(url, ttl=0):
+    future = _FETCHES.get(('text', url))
+    return snapshot_value('text', url, future.result if future else functools.partial(cached_text, url, ttl))
 
 
 # load data source from a url.
-def url_data(url, debug):
+def url_data(url, debug, ttl=0, selection=None):
     print("url_data",url, debug)
-    return load_data( url, requests.get(url, timeout=REQUESTS_TIMEOUT).text, debug)
+    return load_data( url, url_text(url, ttl), debug, selection)
 
 
 # load data source from a file.
-def file_data(rel_path, debug):
-    return load_data( rel_path, open(rel_path, 'r').read(), debug)
+def file_data(rel_path, debug, selection=None):
+    return load_data( rel_path, open(rel_path, 'r').read(), debug, selection)
+
+
+# Load a url or file source once per build, with the selection of all the
+# blocks that use it. The blocks share the data; see BlockData.
+def source_data(kind, path, debug, ttl=0, selection=None):
+    if (kind, path) not in _LOADS:
+        if kind == 'url':
+            load = url_data(path, debug, ttl, selection)
+        else:
+            load = file_data(path, debug, selection)
+        _LOADS[(kind, path)] = [ load, 0 ]
+    entry = _LOADS[(kind, path)]
+    entry[1] += 1
+    if debug and entry[1] > 1:
+        print(f'{kind} {path} is already loaded')
+    return entry[0]
+
+
+# Copy-on-write view of a loaded data source for the sequences of one block.
+# The load is shared by every block of the source and is never changed: a
+# block copies a dict or list before it changes it, and the rows that become
+# part of its sequences, so only what a block selects is copied. Within a
+# block the sequences share those copies and see each other's changes.
+class BlockData:
+    def __init__(self, load):
+        self.root = load
+        # the copies that belong to the block, by id. Holding them keeps the ids unique.
+        self.owned = { }
+        # ids of the copies whose contents belong to the block too
+        self.deep = set()
+
+    def own(self, value):
+        if not isinstance(value, (dict, list)) or id(value) in self.owned:
+            return value
+        value = copy.copy(value)
+        self.owned[id(value)] = value
+        return value
+
+    # parent[key] of a parent that belongs to the block, copied if needed
+    def child(self, parent, key):
+        value = parent[key]
+        owned = self.own(value)
+        if owned is not value:
+            parent[key] = owned
+        return owned
+
+    # the sub dictionary at the path of parts, copied from the root down
+    def walk(self, parts):
+        reference = self.root = self.own(self.root)
+        for part in parts:
+            reference = self.child(reference, part)
+        return reference
+
+    # copy everything within reference, which belongs to the block
+    def own_all(self, reference):
+        stack = [ reference ]
+        while stack:
+            container = stack.pop()
+            if not isinstance(container, (dict, list)) or id(container) in self.deep:
+                continue
+            self.deep.add(id(container))
+            keys = list(container) if isinstance(container, dict) else range(len(container))
+            for key in keys:
+                stack.append(self.child(container, key))
+        return reference
 
 
 # remove parts of a data source we don't want ro access
@@ -174,20 +586,68 @@ def asfid_part(reference, part):
         reference[refs]['availid'] = availid
 
 
+# Checks whether logos exist on www.apache.org. The HEAD requests of a
+# sequence are sent concurrently over one keep-alive session. A status is
+# kept in the HTTP cache for ASF_DATA_LOGO_TTL seconds. With the logo paths
+# listed, one per line, in the file ASF_DATA_LOGO_MANIFEST, no request is
+# made: a logo exists if it is listed.
+class LogoChecks:
+    def __init__(self, cache=None, ttl=0, manifest=None, workers=1):
+        self.cache = cache
+        self.ttl = ttl
+        self.manifest = None
+        if manifest:
+            with open(manifest, 'r') as f:
+                self.manifest = { line.strip().lstrip('/') for line in f if line.strip() }
+        self.workers = max(workers or 1, 1)
+        self.session = None
+
+    # the status of a HEAD request, None if there is no answer
+    def head_status(self, url):
+        key = hashlib.sha256(f'HEAD {url}'.encode('utf-8')).hexdigest()
+        entry = self.cache.load(key) if self.cache else None
+        if entry and entry['url'] == url and time.time() - entry['time'] < self.ttl:
+            return entry['status']
+        try:
+            status = self.session.head(url, timeout=REQUESTS_TIMEOUT).status_code
+        except requests.exceptions.RequestException:
+            return None
+        if self.cache:
+            self.cache.store(key, { 'url': url, 'status': status, 'time': time.time() })
+        return status
+
+    def status(self, url):
+        try:
+            return snapshot_value('head', url, functools.partial(self.head_status, url))
+        except SnapshotMiss:
+            # not recorded
+            return None
+
+    # the logos, of paths relative to LOGO_SITE, that exist
+    def existing(self, logos):
+        logos = list(dict.fromkeys(logos))
+        if self.manifest is not None:
+            return { logo for logo in logos if logo in self.manifest }
+        urls = [ LOGO_SITE + logo for logo in logos ]
+        with requests.Session() as self.session:
+            adapter = requests.adapters.HTTPAdapter(pool_maxsize=self.workers)
+            self.session.mount('https://', adapter)
+            with concurrent.futures.ThreadPoolExecutor(max_workers=self.workers) as executor:
+                statuses = list(executor.map(self.status, urls))
+        self.session = None
+        return { logo for logo, status in zip(logos, statuses) if status == 200 }
+
+
 # add logo attribute with HEAD check for existence. If nonexistent use default.
 def add_logo(reference, part):
     # split between logo pattern and default.
     parts = part.split(',')
-    for item in reference:
-        # the logo pattern includes a place to insert the project/podling key
-        logo = (parts[0].format(item.key_id))
-        # HEAD request
-        try:
-            response = requests.head('https://www.apache.org/' + logo, timeout=REQUESTS_TIMEOUT)
-            if response.status_code != 200:
-                # logo not found - use the default logo
-                logo = parts[1]
-        except requests.exceptions.Timeout:
+    # the logo pattern includes a place to insert the project/podling key
+    logos = [ parts[0].format(item.key_id) for item in reference ]
+    existing = (_LOGO_CHECKS or LogoChecks()).existing(logos)
+    for item, logo in zip(reference, logos):
+        if logo not in existing:
+            # logo not found - use the default logo
             logo = parts[1]
         # save the logo path as an attribute
         setattr(item, 'logo', logo)
@@ -263,9 +723,23 @@ def split_list(metadata, seq, reference, split):
         print(f'WARNING: {seq} not all of sequence consumed: short {size-nseq} projects')
 
 
+# the indexes of a random sample of count from size items. A snapshot
+# records them, so that replaying the build samples the same items.
+def random_sample(seq, size, count):
+    sample = functools.partial(random.sample, range(size), count)
+    try:
+        indexes = snapshot_value('random', seq, sample)
+    except SnapshotMiss:
+        # a snapshot recorded before samples were
+        return sample()
+    if any(i >= size for i in indexes):
+        return sample()
+    return indexes
+
+
 # process sequencing transformations to the data source
-def process_sequence(metadata, seq, sequence, load, debug):
-    reference = load
+def process_sequence(metadata, seq, sequence, data, debug):
+    reference = data.walk([ ])
     # has been converted to a sequence
     is_sequence = False
     # has been converted to a dictionary - won't be made into a sequence
@@ -281,9 +755,7 @@ def process_sequence(metadata, seq, sequence, load, debug):
     if 'path' in sequence:
         if debug:
             print(f'path: {sequence["path"]}')
-        parts = sequence['path'].split('.')
-        for part in parts:
-            reference = reference[part]
+        reference = data.walk(sequence['path'].split('.'))
 
     # filter dictionary by attribute value. if filter is false discard
     if 'where' in sequence:
@@ -296,6 +768,7 @@ def process_sequence(metadata, seq, sequence, load, debug):
         if debug:
             print(f'trim: {sequence["trim"]}')
         parts = sequence['trim'].split(',')
+        data.own_all(reference)
         for part in parts:
             remove_part(reference, part)
 
@@ -303,13 +776,13 @@ def process_sequence(metadata, seq, sequence, load, debug):
     if 'asfid' in sequence:
         if debug:
             print(f'asfid: {sequence["asfid"]}')
-        asfid_part(reference, sequence['asfid'])
+        asfid_part(data.own_all(reference), sequence['asfid'])
 
     # add first letter ofr alphabetic categories
     if 'alpha' in sequence:
         if debug:
             print(f'alpha: {sequence["alpha"]}')
-        alpha_part(reference, sequence['alpha'])
+        alpha_part(data.own_all(reference), sequence['alpha'])
 
     # this dictionary is derived from sub-dictionaries
     if 'dictionary' in sequence:
@@ -319,8 +792,9 @@ def process_sequence(metadata, seq, sequence, load, debug):
         paths = sequence['dictionary'].split(',')
         # create a dictionary from the keys in one or more sub-dictionaries
         for path in paths:
-            for key in load[path]:
-                reference[key] = load[path][key]
+            sub = data.own_all(data.walk([ path ]))
+            for key in sub:
+                reference[key] = sub[key]
         # dictionary result, do not sequence
         is_dictionary = True
 
@@ -337,7 +811,7 @@ def process_sequence(metadata, seq, sequence, load, debug):
         if debug:
             print(f'random: {sequence["random"]}')
         if is_sequence:
-            reference = random.sample(reference, sequence['random'])
+            reference = [ reference[i] for i in random_sample(seq, len(reference), sequence['random']) ]
         else:
             print(f'{seq} - random requires an existing sequence to sample')
 
@@ -379,9 +853,9 @@ def process_sequence(metadata, seq, sequence, load, debug):
         if debug:
             print(f'{seq}: create sequence')
         if isinstance(reference, dict):
-            reference = sequence_dict(seq, reference)
+            reference = sequence_dict(seq, data.own_all(reference))
         elif isinstance(reference, list):
-            reference = sequence_list(seq, reference)
+            reference = sequence_list(seq, data.own_all(reference))
 
     # save sequence in metadata
     if save_metadata:
@@ -394,11 +868,12 @@ def process_sequence(metadata, seq, sequence, load, debug):
 
 # create metadata sequences and dictionaries from a data load
 def process_load(metadata, value, load, debug):
+    data = BlockData(load)
     for seq in value:
-        if seq not in ('url', 'file'):
+        if seq not in ('url', 'file', 'ttl'):
             # one or more sequences
             sequence = value[seq]
-            process_sequence(metadata, seq, sequence, load, debug)
+            process_sequence(metadata, seq, sequence, data, debug)
 
 
 # convert byte count to human-readable (1k 2m 3g etc)
@@ -413,122 +888,214 @@ def os_popen(args):
     return subprocess.Popen(args, stdout=subprocess.PIPE, universal_newlines=True)
 
 
+# the svn url of a project's releases
+def release_url(project):
+    return f'{DIST_RELEASE}/{project}'
+
+
+# the last changed revision of an svn url, None if svn cannot tell
+def svn_revision(url):
+    with _SVN_SLOTS:
+        result = subprocess.run(['svn', 'info', '--show-item', 'last-changed-revision', url],
+                                stdout=subprocess.PIPE, stderr=subprocess.DEVNULL, universal_newlines=True,
+                                check=False)
+    try:
+        return int(result.stdout)
+    except ValueError:
+        return None
+
+
+# the lines of svn ls -Rv
+def svn_ls(url):
+    with _SVN_SLOTS, os_popen(['svn', 'ls', '-Rv', url]) as s:
+        return s.stdout.readlines()
+
+
+# the lines of svn ls -Rv, as svn writes them
+def svn_listing(url):
+    if _SNAPSHOT:
+        yield from snapshot_value('svn', url, functools.partial(svn_ls, url))
+        return
+    with _SVN_SLOTS, os_popen(['svn', 'ls', '-Rv', url]) as s:
+        yield from s.stdout
+
+
+# the size of a release file, as it is shown
+def format_size(fsize):
+    # convert to number of MB
+    if float(fsize) > 524288:
+        return ('%.2f' % bytesto(fsize, 'm')) + ' MB'
+    return ('%.2f' % bytesto(fsize, 'k')) + ' KB'
+
+
+# The month of a date in svn ls -v, by its name
+def month_number(name):
+    if name in MONTHS:
+        return MONTHS[name]
+    return datetime.datetime.strptime(f'{name} 01 1970', SVN_DATE_FORMAT).month
+
+
+# The release files of a project, from the lines of svn ls -Rv as they are
+# read. A line is
+#
+#   <revision> <author> <size> <month> <day> <hh:mm or year> <path>
+#
+# where the time is given for the last six months and the year before that.
+class ReleaseListing:
+    def __init__(self, project, src, sort_revision, today=None):
+        self.project = project
+        self.src_re = re.compile(src)
+        self.sort_revision = sort_revision
+        # dates of the last months are in this year, unless that is in the future
+        self.today = today or datetime.datetime.utcnow()
+        self.keys = None
+        # by release: the path of the released file without its extension
+        self.signatures = { }
+        self.checksums = { }
+        # the size in bytes and [ month, day, time or year ], formatted by distributions()
+        self.fsizes = { }
+        self.dtms = { }
+        self.versions = { }
+        self.revisions = { }
+
+    def parse(self, lines):
+        for line in lines:
+            self.add(line)
+        return self
+
+    # the parsed listing, as JSON values
+    def data(self):
+        return { 'today': self.today.isoformat(),
+                 'keys': self.keys,
+                 'signatures': self.signatures,
+                 'checksums': self.checksums,
+                 'fsizes': self.fsizes,
+                 'dtms': self.dtms,
+                 'versions': self.versions,
+                 'revisions': self.revisions }
+
+    # a listing parsed before, from its data()
+    @classmethod
+    def from_data(cls, project, src, sort_revision, data):
+        listing = cls(project, src, sort_revision, datetime.datetime.fromisoformat(data['today']))
+        for name in ('keys', 'signatures', 'checksums', 'fsizes', 'dtms', 'versions', 'revisions'):
+            setattr(listing, name, data[name])
+        return listing
+
+    def date(self, month, day, time_or_year):
+        month = month_number(month)
+        day = int(day)
+        if ':' in time_or_year:
+            # in the past year
+            year = self.today.year
+            if (month, day) > (self.today.month, self.today.day):
+                year -= 1
+        else:
+            year = int(time_or_year)
+        # date is close enough
+        return f'{month:02d}/{day:02d}/{year}'
+
+    def add(self, line):
+        listing = line.split(None, 6)
+        if len(listing) < 7 or line.rstrip()[-1:] == '/':
+            # skip directories
+            return
+        if not listing[2].isdigit():
+            # a locked file: O between the author and the size
+            listing = line.split(None, 7)
+            del listing[2]
+        # path is the last field
+        path = listing[6].rstrip()
+        # fields are parts of the path
+        fields = path.split('/')
+        # filename is the final part
+        filename = fields[-1]
+        if not filename:
+            return
+        if KEYS_RE.search(filename):
+            # save the KEYS file url
+            self.keys = f'https://downloads.apache.org/{self.project}/{path}'
+        elif SIGNATURE_RE.search(filename):
+            # we key a release off of a signature. remove the extension
+            release = path.rsplit('.', 1)[0]
+            self.signatures[release] = filename
+            # the path to the signature is used as the version
+            self.versions[release] = '/'.join(fields[:-1])
+            # we use the revision for sorting
+            revision = int(listing[0]) if self.sort_revision else 0
+            if self.src_re.search(filename):
+                # put source distributions in the front (it is a reverse sort)
+                revision += 100000
+            self.revisions[release] = revision
+        elif CHECKSUM_RE.search(filename):
+            # some projects checksum their signatures
+            release = path.rsplit('.', 1)[0]
+            if release.rsplit('.', 1)[-1] == 'asc':
+                # skip files that are hashes of signatures
+                return
+            # strip the extension to get the release name
+            self.checksums[release] = filename
+        else:
+            # for the released file save the size and dtm
+            self.fsizes[path] = listing[2]
+            self.dtms[path] = listing[3:6]
+
+    # the Version of each release directory, most recent first
+    def distributions(self):
+        # separate versions.
+        each_version = { }
+        for rel in self.signatures:
+            version = self.versions[rel]
+            if version not in each_version:
+                each_version[version] = []
+            release = rel[len(version) + 1:]
+            try:
+                each_version[version].append( Distribution(release=release,
+                                                           revision=self.revisions[rel],
+                                                           signature=self.signatures[rel],
+                                                           checksum=self.checksums[rel],
+                                                           dtm=self.date(*self.dtms[rel]),
+                                                           fsize=format_size(self.fsizes[rel])))
+            except Exception:
+                traceback.print_exc()
+
+        distributions = []
+        for version in each_version:
+            each_version[version].sort(key=lambda x: (-x.revision, x.release))
+            distributions.append( Version(version=version,
+                                          name=' '.join(version.split('/')),
+                                          revision=each_version[version][0].revision,
+                                          release=each_version[version]))
+        distributions.sort(key=lambda x: (-x.revision, x.version))
+        return distributions
+
+
 # retrieve the release distributions for a project from svn
 def process_distributions(project, src, sort_revision, debug):
     if debug:
-        print(f'releases: {project}')
-
-    # current date information will help process svn ls results
-    gatherDate = datetime.datetime.utcnow()
-    gatherYear = gatherDate.year
-
-    # information to accumulate
-    signatures = {}
-    checksums = {}
-    fsizes = {}
-    dtms = {}
-    versions = {}
-    revisions = {}
-    keys = None # ensure defined before use
-
-    # read the output from svn ls -Rv
-    url = f'https://dist.apache.org/repos/dist/release/{project}'
-    if debug:
-        print(f'releases: {url}')
-    with os_popen(['svn', 'ls', '-Rv', url]) as s:
-        for line in s.stdout:
-            line = line.strip()
-            listing = line.split(' ')
-            if line[-1:] == '/':
-                # skip directories
-                continue
-            if sort_revision:
-                revision = int(listing[0])
-            else:
-                revision = 0
-            # user = listing[1]
-            if listing[-6] == '':
-                # dtm in the past year
-                dtm1 = datetime.datetime.strptime(" ".join(listing[-4:-2]) + " " + str(gatherYear), SVN_DATE_FORMAT)
-                if dtm1 > gatherDate:
-                    dtm1 = datetime.datetime.strptime(" ".join(listing[-4:-2]) + " " + str(gatherYear - 1), SVN_DATE_FORMAT)
-                fsize = listing[-5]
-            else:
-                # dtm older than one year
-                dtm1 = datetime.datetime.strptime(" ".join(listing[-5:-1]), SVN_DATE_FORMAT)
-                fsize = listing[-6]
-            # date is close enough
-            dtm = dtm1.strftime("%m/%d/%Y")
-            # convert to number of MB
-            if float(fsize) > 524288:
-                fsize = ('%.2f' % bytesto(fsize, 'm')) + ' MB'
-            else:
-                fsize = ('%.2f' % bytesto(fsize, 'k')) + ' KB'
-            # line is path
-            line = listing[-1]
-            # fields are parts of the path
-            fields = line.split('/')
-            # filename os the final part
-            filename = fields[-1]
-            # parts includes the whole path
-            parts = line.split('.')
-            # use the path as a key for each release
-            release = line
-            if filename:
-                if re.search('KEYS(\\.txt)?$', filename):
-                    # save the KEYS file url
-                    keys = f'https://downloads.apache.org/{project}/{line}'
-                elif re.search('\\.(asc|sig)$', filename, flags=re.IGNORECASE):
-                    # we key a release off of a signature. remove the extension
-                    release = '.'.join(parts[:-1])
-                    signatures[release] = filename
-                    # the path to the signature is used as the version
-                    versions[release] = '/'.join(fields[:-1])
-                    # we use the revision for sorting
-                    revisions[release] = revision
-                    if re.search(src, filename):
-                        # put source distributions in the front (it is a reverse sort)
-                        revisions[release] = revision + 100000
-                elif re.search('\\.(sha512|sha1|sha256|sha|md5|mds)$', filename, flags=re.IGNORECASE):
-                    # some projects checksum their signatures
-                    part0 = ".".join(line.split('.')[-2:-1])
-                    if part0 == "asc":
-                        # skip files that are hashes of signatures
-                        continue
-                    # strip the extension to get the release name
-                    release = '.'.join(parts[:-1])
-                    checksums[release] = filename
-                else:
-                    # for the released file save the size and dtm
-                    fsizes[release] = fsize
-                    dtms[release] = dtm
-
-    # separate versions.
-    each_version = {}
-    for rel in signatures:
-        version = versions[rel]
-        if version not in each_version:
-            each_version[version] = []
-        release = rel[len(version) + 1:]
-        try:
-            each_version[version].append( Distribution(release=release,
-                                                       revision=revisions[rel],
-                                                       signature=signatures[rel],
-                                                       checksum=checksums[rel],
-                                                       dtm=dtms[rel],
-                                                       fsize=fsizes[rel]))
-        except Exception:
-            traceback.print_exc()
-
-    distributions = []
-    for version in each_version:
-        each_version[version].sort(key=lambda x: (-x.revision, x.release))
-        distributions.append( Version(version=version,
-                                      name=' '.join(version.split('/')),
-                                      revision=each_version[version][0].revision,
-                                      release=each_version[version]))
-    distributions.sort(key=lambda x: (-x.revision, x.version))
-    return keys, distributions
+        print(f'releases: {project} {release_url(project)}')
+    future = _FETCHES.get(('release', project, src, sort_revision))
+    listing = future.result() if future else release_listing(project, src, sort_revision)
+    return listing.keys, listing.distributions()
+
+
+# The ReleaseListing of a project. The listing is kept in the asfdata cache
+# with the last changed revision of the release directory, and is listed
+# again only when that revision changes.
+def release_listing(project, src, sort_revision):
+    url = release_url(project)
+    if _HTTP_CACHE is None or _SNAPSHOT:
+        # read the output from svn ls -Rv
+        return ReleaseListing(project, src, sort_revision).parse(svn_listing(url))
+    revision = svn_revision(url)
+    key = hashlib.sha256(json.dumps([ 'release', url, src, sort_revision ]).encode('utf-8')).hexdigest()
+    entry = _HTTP_CACHE.load(key)
+    if revision is not None and entry and entry['url'] == url and entry['revision'] == revision:
+        return ReleaseListing.from_data(project, src, sort_revision, entry['listing'])
+    listing = ReleaseListing(project, src, sort_revision).parse(svn_listing(url))
+    if revision is not None:
+        _HTTP_CACHE.store(key, { 'url': url, 'revision': revision, 'listing': listing.data() })
+    return listing
 
 
 # get xml text node
@@ -560,12 +1127,12 @@ def truncate_words(text, words):
 
 
 # retrieve blog posts from an Atom feed.
-def process_blog(feed, count, words, debug):
+def process_blog(feed, count, words, debug, ttl=0):
     if debug:
         print(f'blog feed: {feed}')
     # See INFRA-23636: cannot check the page status, so just catch parsing errors
     try:
-        content = requests.get(feed, timeout=REQUESTS_TIMEOUT).text
+        content = url_text(feed, ttl)
         dom = xml.dom.minidom.parseString(content)
         # dive into the dom to get 'entry' elements
         entries = dom.getElementsByTagName('entry')
@@ -604,6 +1171,7 @@ def process_blog(feed, count, words, debug):
 
 
 # to be updated from hidden location. (Need to discuss local.)
+@functools.lru_cache(maxsize=None)  # looked up by prefetch() too
 def twitter_auth():
     authtokens = os.path.join(os.path.expanduser('~'), '.authtokens')
     try:
@@ -617,13 +1185,26 @@ def twitter_auth():
     return None
 
 
+# the recent tweets of a handle
+def twitter_url(handle):
+    query = f'from:{handle}'
+    tweet_fields = 'tweet.fields=author_id'
+    return f'https://api.twitter.com/2/tweets/search/recent?query={query}&{tweet_fields}'
+
+
+def twitter_headers(bearer_token):
+    return {'Authorization': f'Bearer {bearer_token}'}
+
+
 # retrieve from twitter
 def connect_to_endpoint(url, headers):
-    response = requests.request('GET', url, headers=headers, timeout=REQUESTS_TIMEOUT)
-    if response.status_code != 200:
-        # TODO: choose better exception
-        raise Exception(response.status_code, response.text) # pylint: disable=broad-exception-raised
-    return response.json()
+    def get():
+        response = http_get(url, headers)
+        if response.status_code != 200:
+            # TODO: choose better exception
+            raise Exception(response.status_code, response.text) # pylint: disable=broad-exception-raised
+        return response.json()
+    return snapshot_value('twitter', url, get)
 
 
 # retrieve the last count recent tweets from the handle.
@@ -631,18 +1212,14 @@ def process_twitter(handle, count, debug):
     if debug:
         print(f'-----\ntwitter feed: {handle}')
     bearer_token = twitter_auth()
-    if not bearer_token:
+    if not bearer_token and not (_SNAPSHOT and _SNAPSHOT.replay):
         print('WARN: no bearer token for Twitter')
         return sequence_list('twitter',[{
             'text': 'To retrieve tweets supply a valid twitter bearer token in ~/.authtokens'
         }])
     # do not print or display bearer_token as it is a secret
-    query = f'from:{handle}'
-    tweet_fields = 'tweet.fields=author_id'
-    url = f'https://api.twitter.com/2/tweets/search/recent?query={query}&{tweet_fields}'
-    headers = {'Authorization': f'Bearer {bearer_token}'}
     try:
-        load = connect_to_endpoint(url, headers)
+        load = connect_to_endpoint(twitter_url(handle), twitter_headers(bearer_token))
     except Exception as e:
         print(f'ERROR: Cannot connect to Twitter for {handle}: {e}')
         return sequence_list('twitter',[{ 'text': 'Cannot connect to Twitter at present' }])
@@ -665,11 +1242,11 @@ def process_twitter(handle, count, debug):
 
 
 # create sequence of sequences of ASF ECCN data.
-def process_eccn(fname, debug):
+def process_eccn(fname, debug, ttl=0):
     if debug:
         print('-----\nECCN:', fname)
     if fname.startswith("https://"):
-        j = yaml.safe_load(requests.get(fname, timeout=REQUESTS_TIMEOUT).text)
+        j = yaml.safe_load(url_text(fname, ttl))
     else:
         j = yaml.safe_load(open(fname))
 
@@ -737,8 +1314,185 @@ class Distribution(wrapper):
     pass
 
 
+# Start fetching the network data sources of the configuration, at most
+# workers at a time. config_read_data() then processes the sources in order,
+# and each waits only for its own data.
+def prefetch(config_data, workers, debug):
+    executor = concurrent.futures.ThreadPoolExecutor(max_workers=workers)
+
+    def submit(key, fn, *args):
+        if key not in _FETCHES:
+            _FETCHES[key] = executor.submit(fn, *args)
+
+    for key, value in config_data.items():
+        if key == 'eccn':
+            if value['file'].startswith('https://'):
+                submit(('text', value['file']), cached_text, value['file'], value.get('ttl'))
+        elif key == 'twitter':
+            bearer_token = twitter_auth()
+            if bearer_token:
+                url = twitter_url(value['handle'])
+                submit(('GET', url), http_request, url, twitter_headers(bearer_token))
+        elif isinstance(value, dict):
+            # the same order of precedence as config_read_data()
+            if 'blog' in value:
+                submit(('text', value['blog']), cached_text, value['blog'], value.get('ttl'))
+            elif 'release' in value:
+                submit(('release', value['release'], value['src'], value['revision']),
+                       release_listing, value['release'], value['src'], value['revision'])
+            elif 'url' in value:
+                submit(('text', value['url']), cached_text, value['url'], value.get('ttl'))
+    # the queued fetches still run
+    executor.shutdown(wait=False)
+    if debug:
+        print(f'prefetch: {len(_FETCHES)} data sources with {workers} workers')
+
+
+# create metadata from the data sources of the configuration, in order.
+def read_data(config_data, metadata, debug):
+    selections = source_selections(config_data)
+    for key in config_data:
+        # first check for data that is a singleton with special handling
+        if key == 'eccn':
+            # process eccn data
+            fname = config_data[key]['file']
+            metadata[key] = v = process_eccn(fname, debug, config_data[key].get('ttl'))
+            if debug:
+                print('ECCN V:', v)
+            continue
+
+        if key == 'twitter':
+            # process twitter data
+            # if we decide to have multiple twitter feeds available then move next to blog below
+            handle = config_data[key]['handle']
+            count = config_data[key]['count']
+            metadata[key] = v = process_twitter(handle, count, debug)
+            if debug:
+                print('TWITTER V:', v)
+            continue
+
+        value = config_data[key]
+        if isinstance(value, dict):
+            # dictionaries may have multiple data structures that are processed with a sequence of actions
+            # into multiple sequences and dictionaries.
+            if debug:
+                print(f'-----\n{key} creates one or more sequences')
+                print(value)
+            # special cases that are multiple are processed first
+            if 'blog' in value:
+                # process blog feed
+                feed = config_data[key]['blog']
+                count = config_data[key]['count']
+                if 'content' in config_data[key].keys():
+                    words = config_data[key]['content']
+                else:
+                    words = None
+                metadata[key] = v = process_blog(feed, count, words, debug, value.get('ttl'))
+                if debug:
+                    print('BLOG V:', v)
+                continue
+
+            elif 'release' in value:
+                # retrieve active release distributions
+                src = config_data[key]['src']
+                revision = config_data[key]['revision']
+                project = config_data[key]['release']
+                keys, distributions = process_distributions(project, src, revision, debug)
+                metadata[key] = v = distributions
+                metadata[f"{key}-keys"] = keys
+                metadata[f"{key}-project"] = project
+                if debug:
+                    print('RELEASE V:', v)
+
+            elif 'url' in value:
+                # process a url based data source
+                load = source_data('url', value['url'], debug, value.get('ttl'),
+                                   selections.get(('url', value['url'])))
+                process_load(metadata, value, load, debug)
+
+            elif 'file' in value:
+                # process a file from within the site tree
+                load = source_data('file', value['file'], debug,
+                                   selection=selections.get(('file', value['file'])))
+                process_load(metadata, value, load, debug)
+
+            else:
+                # should probably be an error but doesn't matter
+                metadata[key] = value
+        else:
+            # simple metadata values - either an int or str
+            if debug:
+                print(f'{key} = {value}')
+            metadata[key] = value
+
+
+# A data source that is not in the snapshot being replayed. Replaying a
+# build is like building without a network, so it is a ConnectionError.
+class SnapshotMiss(requests.exceptions.ConnectionError):
+    pass
+
+
+# The data sources of a build, as fetched: the text of url, blog and eccn
+# sources, the lines of svn listings, tweets, logo checks and the items
+# of random samples. With
+#
+#   ASF_DATA['record'] = 'asfdata.snapshot.gz'
+#
+# a build saves them in a gzipped JSON file, and with ASF_DATA['replay']
+# a build reads them from the file instead of the network.
+class Snapshot:
+    FORMAT = 1
+
+    def __init__(self, path, replay):
+        self.path = path
+        self.replay = replay
+        # kind -> key -> value
+        self.sources = { }
+        if replay:
+            with gzip.open(path, 'rt', encoding='utf-8') as f:
+                data = json.load(f)
+            if data.get('format') != self.FORMAT:
+                # TODO: choose better exception
+                raise Exception(f'{path} is not an asfdata snapshot of format {self.FORMAT}') # pylint: disable=broad-exception-raised
+            self.sources = data['sources']
+
+    def value(self, kind, key, fetch):
+        if self.replay:
+            try:
+                return self.sources[kind][key]
+            except KeyError:
+                raise SnapshotMiss(f'{kind} {key} is not in the snapshot {self.path}') from None
+        value = fetch()
+        self.sources.setdefault(kind, { })[key] = value
+        return value
+
+    def save(self):
+        with gzip.open(self.path, 'wt', encoding='utf-8') as f:
+            json.dump({ 'format': self.FORMAT, 'sources': self.sources }, f, separators=(',', ':'))
+        return sum(len(values) for values in self.sources.values())
+
+
+# fetch a data source, or take it from the snapshot
+def snapshot_value(kind, key, fetch):
+    if _SNAPSHOT is None:
+        return fetch()
+    return _SNAPSHOT.value(kind, key, fetch)
+
+
+# open the HTTP cache of the settings
+def http_cache(settings):
+    global _HTTP_CACHE  # pylint: disable=global-statement
+    path = settings.get('ASF_DATA_CACHE_DIR', ASF_DATA_CACHE_DIR)
+    if not path:
+        _HTTP_CACHE = None
+    elif not _HTTP_CACHE or _HTTP_CACHE.path != path:
+        _HTTP_CACHE = asfcache.DiskCache(path, settings.get('ASF_DATA_CACHE_SIZE', ASF_DATA_CACHE_SIZE),
+                                         'asfdata cache')
+
+
 # create metadata according to instructions.
 def config_read_data(pel_ob):
+    global _SNAPSHOT, _LOGO_CHECKS, _SVN_SLOTS  # pylint: disable=global-statement
     print('-----\nasfdata')
 
     asf_data = pel_ob.settings.get('ASF_DATA')
@@ -763,77 +1517,35 @@ def config_read_data(pel_ob):
         if debug:
             print(f'Processing {asf_data["data"]}')
         config_data = read_config(asf_data['data'], debug)
-        for key in config_data:
-            # first check for data that is a singleton with special handling
-            if key == 'eccn':
-                # process eccn data
-                fname = config_data[key]['file']
-                metadata[key] = v = process_eccn(fname, debug)
-                if debug:
-                    print('ECCN V:', v)
-                continue
-
-            if key == 'twitter':
-                # process twitter data
-                # if we decide to have multiple twitter feeds available then move next to blog below
-                handle = config_data[key]['handle']
-                count = config_data[key]['count']
-                metadata[key] = v = process_twitter(handle, count, debug)
-                if debug:
-                    print('TWITTER V:', v)
-                continue
-
-            value = config_data[key]
-            if isinstance(value, dict):
-                # dictionaries may have multiple data structures that are processed with a sequence of actions
-                # into multiple sequences and dictionaries.
-                if debug:
-                    print(f'-----\n{key} creates one or more sequences')
-                    print(value)
-                # special cases that are multiple are processed first
-                if 'blog' in value:
-                    # process blog feed
-                    feed = config_data[key]['blog']
-                    count = config_data[key]['count']
-                    if 'content' in config_data[key].keys():
-                        words = config_data[key]['content']
-                    else:
-                        words = None
-                    metadata[key] = v = process_blog(feed, count, words, debug)
-                    if debug:
-                        print('BLOG V:', v)
-                    continue
-
-                elif 'release' in value:
-                    # retrieve active release distributions
-                    src = config_data[key]['src']
-                    revision = config_data[key]['revision']
-                    project = config_data[key]['release']
-                    keys, distributions = process_distributions(project, src, revision, debug)
-                    metadata[key] = v = distributions
-                    metadata[f"{key}-keys"] = keys
-                    metadata[f"{key}-project"] = project
-                    if debug:
-                        print('RELEASE V:', v)
-
-                elif 'url' in value:
-                    # process a url based data source
-                    load = url_data(value['url'], debug)
-                    process_load(metadata, value, load, debug)
-
-                elif 'file' in value:
-                    # process a file from within the site tree
-                    load = file_data(value['file'], debug)
-                    process_load(metadata, value, load, debug)
-
-                else:
-                    # should probably be an error but doesn't matter
-                    metadata[key] = value
-            else:
-                # simple metadata values - either an int or str
-                if debug:
-                    print(f'{key} = {value}')
-                metadata[key] = value
+        http_cache(pel_ob.settings)
+        if asf_data.get('replay'):
+            print(f'asfdata: replaying the data sources of {asf_data["replay"]}')
+            _SNAPSHOT = Snapshot(asf_data['replay'], replay=True)
+        elif asf_data.get('record'):
+            _SNAPSHOT = Snapshot(asf_data['record'], replay=False)
+        workers = pel_ob.settings.get('ASF_DATA_FETCH_WORKERS', ASF_DATA_FETCH_WORKERS)
+        _LOGO_CHECKS = LogoChecks(_HTTP_CACHE, pel_ob.settings.get('ASF_DATA_LOGO_TTL', ASF_DATA_LOGO_TTL),
+                                  pel_ob.settings.get('ASF_DATA_LOGO_MANIFEST'), workers)
+        _SVN_SLOTS = threading.BoundedSemaphore(max(pel_ob.settings.get('ASF_DATA_SVN_WORKERS', ASF_DATA_SVN_WORKERS), 1))
+        if workers and workers > 1 and not (_SNAPSHOT and _SNAPSHOT.replay):
+            prefetch(config_data, workers, debug)
+        try:
+            read_data(config_data, metadata, debug)
+            if _SNAPSHOT and not _SNAPSHOT.replay:
+                count = _SNAPSHOT.save()
+                print(f'asfdata: recorded {count} data sources in {_SNAPSHOT.path}')
+            saved = sum(uses - 1 for _load, uses in _LOADS.values())
+            if saved:
+                print(f'asfdata: {saved} fetches saved, {len(_LOADS)} url and file sources loaded once')
+            if _HTTP_RESULTS:
+                counts = ', '.join(f'{_HTTP_RESULTS.count(r)} {r}' for r in ('fresh', 'not modified', 'downloaded'))
+                print(f'asfdata: cached sources: {counts}')
+        finally:
+            _FETCHES.clear()
+            _LOADS.clear()
+            _HTTP_RESULTS.clear()
+            _SNAPSHOT = None
+            _LOGO_CHECKS = None
 
     # display asfdata metadata or metadata type
     print('-----')
@@ -0,0 +1,97 @@
+#!/usr/bin/python -B
+#
+# Licensed to the Apache Software Foundation (ASF) under one
+# or more contributor license agreements.  See the NOTICE file
+# distributed with this work for additional information
+# regarding copyright ownership.  The ASF licenses this file
+# to you under the Apache License, Version 2.0 (the
+# "License"); you may not use this file except in compliance
+# with the License.  You may obtain a copy of the License at
+#
+#   http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing,
+# software distributed under the License is distributed on an
+# "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY
+# KIND, either express or implied.  See the License for the
+# specific language governing permissions and limitations
+# under the License.
+#
+# asfexpand.py -- expansion of metadata placeholders
+#
+# This is not a Pelican plugin. asfgenid expands {{ key }} in the html and
+# asfreader expands [{ key }] in the ezmd source, each with a regex whose
+# first group is the key. The key is a str.format() field, so it can be an
+# expression such as [{ project.name }] or [{ releases[0] }].
+#
+
+import re
+
+# characters in an expansion that could form or alter another placeholder,
+# or that re.sub() would treat as a group reference
+UNSAFE_RE = re.compile(r'[{}\[\]\\]')
+
+
+# Expands the placeholders of one page. Each distinct key is looked up in
+# the metadata once; the page's strings are then expanded in one pass each.
+class Expander:
+    def __init__(self, pattern, metadata, verbose=True):
+        self.pattern = pattern
+        self.metadata = metadata
+        # print each expansion, not just the keys that are not found
+        self.verbose = verbose
+        # key -> (found, expansion)
+        self.cache = { }
+
+    # the expansion of a key. A key that is not found becomes {key}.
+    def lookup(self, key):
+        if key not in self.cache:
+            format_string = '{' + key.strip() + '}'
+            try:
+                self.cache[key] = (True, format_string.format_map(self.metadata))
+            except Exception:
+                # the data expression was not found
+                self.cache[key] = (False, format_string)
+        return self.cache[key]
+
+    # print the expansion of a placeholder, as it is made
+    def report(self, m, found, new_string):
+        if not found:
+            print(f'{{{{{m.group(1)}}}}} is not found')
+        elif self.verbose:
+            print(f'{{{{{m.group(1)}}}}} -> {new_string}')
+
+    # expand every placeholder in text
+    def expand(self, text):
+        matches = [ (m, *self.lookup(m.group(1))) for m in self.pattern.finditer(text) ]
+        if not matches:
+            return text
+        parts = [ ]
+        pos = 0
+        for m, _found, new_string in matches:
+            if UNSAFE_RE.search(new_string):
+                # the expansion could form or change another placeholder
+                return self.expand_each(text)
+            parts.append(text[pos:m.start()])
+            parts.append(new_string)
+            pos = m.end()
+        parts.append(text[pos:])
+        result = ''.join(parts)
+        if self.pattern.search(result):
+            # placeholders nested in the text, like {{ {{ key }} }}
+            return self.expand_each(text)
+        for m, found, new_string in matches:
+            self.report(m, found, new_string)
+        return result
+
+    # Expand the first placeholder, then search again from the start, so that
+    # an expansion that contains or completes a placeholder is expanded too.
+    def expand_each(self, text):
+        m = self.pattern.search(text)
+        while m:
+            found, new_string = self.lookup(m.group(1))
+            self.report(m, found, new_string)
+            # the expansion is a re.sub() template, as it always was
+            text = self.pattern.sub(new_string, text, count=1)
+            m = self.pattern.search(text)
+        return text
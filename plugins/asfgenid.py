@@ -9,16 +9,31 @@ Generates a Table of Content
 
 # from __future__ import unicode_literals
 
+import os.path
 import sys
 import traceback
 import re
 import unicodedata
+import contextlib
+import hashlib
+import html
+import io
+import json
+import tempfile
 
-from bs4 import BeautifulSoup, Comment
+import bs4
+from bs4 import Comment, NavigableString, Tag
 
 import pelican.contents
 import pelican.plugins.signals
 
+# asfhtml, asfexpand and asfcache are not plugins. They are helper modules next to this one.
+if os.path.dirname(os.path.abspath(__file__)) not in sys.path:
+    sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+import asfcache  # pylint: disable=wrong-import-position
+import asfexpand  # pylint: disable=wrong-import-position
+import asfhtml  # pylint: disable=wrong-import-position
+
 '''
 Based on
 https://github.com/waylan/Python-Markdown/blob/master/markdown/extensions/headerid.py
@@ -39,18 +54,40 @@ ASF_GENID = {
 }
 
 # Fixup tuples for HTML that GFM makes into text.
-# Fixup [ and ] that download templates use for ezt.
-FIXUP_UNSAFE = [
+FIXUP_TAGS = [
     (re.compile(r'&lt;script'), '<script'),
     (re.compile(r'&lt;/script'), '</script'),
     (re.compile(r'&lt;style'), '<style'),
     (re.compile(r'&lt;/style'), '</style'),
     (re.compile(r'&lt;iframe'), '<iframe'),
     (re.compile(r'&lt;/iframe'), '</iframe'),
+]
+
+# Fixup [ and ] that download templates use for ezt.
+FIXUP_BRACKETS = [
     (re.compile(r'%5B'), '['),
     (re.compile(r'%5D'), ']'),
 ]
 
+FIXUP_UNSAFE = FIXUP_TAGS + FIXUP_BRACKETS
+
+# On-disk cache of the html that genid transformed, keyed by a hash of the
+# html, of the settings and code that transform it, and of the values of
+# the metadata that the page expands. Override the location with
+# ASF_GENID_CACHE_DIR (None disables the cache) and the maximum number of
+# cached pages with ASF_GENID_CACHE_SIZE.
+ASF_GENID_CACHE_DIR = os.path.join(tempfile.gettempdir(), 'genid-cache')
+ASF_GENID_CACHE_SIZE = 50000
+
+# bump when the format of an entry changes
+CACHE_FORMAT = 1
+
+# Open caches, by directory
+_CACHES: dict = { }
+
+# hash of the code that transforms the html, computed on first use
+_CODE_HASH: list = [ ]
+
 # Find {{ metadata }} inclusions
 METADATA_RE = re.compile(r'{{\s*(?P<meta>[-_:a-zA-Z0-9]+)\s*}}')
 
@@ -71,15 +108,25 @@ PARA_MAP = {
 # Find table tags - to check for ones without class attribute.
 TABLE_RE = re.compile(r'^table')
 
+# Pre-scan of the html text, before it is parsed. These only need to be
+# conservative: a match means that the page is parsed and the step runs.
+SCAN_ELEMENTID_RE = re.compile(r'[{\[][ \t]*[#.]')
+SCAN_TAG_RE = re.compile(r'<([a-zA-Z][-a-zA-Z0-9]*)([^>]*)>')
+SCAN_QUOTED_RE = re.compile(r'"[^"]*"|\'[^\']*\'')
+SCAN_ID_RE = re.compile(r'(?:^|\s)id\s*=', re.I)
+SCAN_TABLE_RE = re.compile(r'<table', re.I)
+# character references for { and [ hide annotations from the scan
+SCAN_ENTITY_RE = re.compile(r'&(?:#0*123|#x0*7b|#0*91|#x0*5b|lbrace|lcub|lsqb|lbrack);', re.I)
+
 
 # An item in a Table of Contents - from toc.py
 class HtmlTreeNode(object):
-    def __init__(self, parent, header, level, tag_id):
+    def __init__(self, parent, header, level, id_):
         self.children = []
         self.parent = parent
         self.header = header
         self.level = level
-        self.tag_id = tag_id
+        self.id = id_
 
     def add(self, new_header):
         new_level = new_header.name
@@ -88,7 +135,7 @@ class HtmlTreeNode(object):
 
         if not new_string:
             new_string = new_header.find_all(
-                text=lambda t: not isinstance(t, Comment),
+                string=lambda t: not isinstance(t, Comment),
                 recursive=True)
             new_string = ''.join(new_string)
         new_string = new_string.translate(PARA_MAP)
@@ -104,23 +151,11 @@ class HtmlTreeNode(object):
         elif self.level > new_level:
             return self.parent.add(new_header)
 
-    def __str__(self):
-        ret = ''
-        if self.parent:
-            ret = "<a class='toc-href' href='#{0}' title='{1}'>{1}</a>".format(
-                self.tag_id, self.header)
-
-        if self.children:
-            ret += "<ul>{}</ul>".format('{}' * len(self.children)).format(
-                *self.children)
-
-        if self.parent:
-            ret = "<li>{}</li>".format(ret)
-
-        if not self.parent:
-            ret = "<div id='toc'>{}</div>".format(ret)
-
-        return ret
+    # the ToC as Beautiful Soup tags, ready to insert into the page
+    def to_tag(self):
+        div = Tag(name='div', attrs={ 'id': 'toc' })
+        asfhtml.toc_lists(self, div)
+        return div
 
 
 # assure configuration
@@ -140,15 +175,38 @@ def slugify(value, separator):
     return re.sub('[%s\\s]+' % separator, separator, value)
 
 
+# A set of ids that remembers which '_N' suffixes are taken, so that
+# allocating a unique id does not probe the same suffixes again.
+class IdSet(set):
+    def __init__(self):
+        super().__init__()
+        # base -> (start, end): base_start ... base_{end-1} are all in the set
+        self.runs = { }
+
+    # the first of base_n, base_{n+1}, ... that is not in the set
+    def allocate(self, base, n):
+        start, end = self.runs.get(base, (n, n))
+        if start <= n <= end:
+            # skip over the suffixes already known to be taken
+            m = end
+        else:
+            start = m = n
+        while f'{base}_{m}' in self:
+            m += 1
+        # the caller adds base_m
+        self.runs[base] = (start, m + 1)
+        return f'{base}_{m}'
+
+
 # Ensure an id is unique in a set of ids. Append '_1', '_2'... if not
 def unique(tag_id, ids):
-    while tag_id in ids or not tag_id:
-        m = IDCOUNT_RE.match(tag_id)
+    if tag_id in ids or not tag_id:
         print(f'WARNING: id="{tag_id}" is a duplicate')
+        m = IDCOUNT_RE.match(tag_id)
         if m:
-            tag_id = '%s_%d' % (m.group(1), int(m.group(2)) + 1)
+            tag_id = ids.allocate(m.group(1), int(m.group(2)) + 1)
         else:
-            tag_id = '%s_%d' % (tag_id, 1)
+            tag_id = ids.allocate(tag_id, 1)
     ids.add(tag_id)
     return tag_id
 
@@ -163,42 +221,29 @@ def permalink(soup, mod_element):
 
 
 # fixup cmark content - note that this may be too hungry. It may need to occur later and skipped in codeblock and pre tags.
-def fixup_content(content):
-    text = content._content # pylint: disable=protected-access
+def fixup_content(content, fixups=None):
+    if fixups is None:
+        fixups = FIXUP_UNSAFE
+    text = asfhtml.pipeline(content).text()
     modified = False
     # Find messed up html
-    for regex, replace in FIXUP_UNSAFE:
-        m = regex.search(text)
-        if m:
+    for regex, replace in fixups:
+        text, count = regex.subn(replace, text)
+        if count:
             modified = True
-            text = re.sub(regex, replace, text)
     if modified:
-        content._content = text # pylint: disable=protected-access
+        asfhtml.pipeline(content).set_text(text)
 
 
-# expand metadata found in {{ key }}
-def expand_metadata(tag, metadata, debug):
+# expand metadata found in {{ key }}. Returns the string that replaces the tag.
+def expand_metadata(tag, expander):
     this_string = str(tag.string)
-    m = 1
-    modified = False
-    while m:
-        m = METADATA_RE.search(this_string)
-        if m:
-            this_data = m.group(1).strip()
-            format_string = '{{{0}}}'.format(this_data)
-            try:
-                new_string = format_string.format(**metadata)
-                if debug:
-                    print(f'{{{{{m.group(1)}}}}} -> {new_string}')
-            except Exception:
-                # the data expression was not found
-                print(f'{{{{{m.group(1)}}}}} is not found')
-                new_string = format_string
-            # replace the first pattern with the new_string
-            this_string = re.sub(METADATA_RE, new_string, this_string, count=1)
-            modified = True
-    if modified:
-        tag.string.replace_with(this_string)
+    new_string = expander.expand(this_string)
+    if new_string != this_string:
+        new_tag = NavigableString(new_string)
+        tag.string.replace_with(new_tag)
+        return new_tag
+    return tag
 
 
 # do elementid transformation for {#id} and {.class} attribute annotations.
@@ -207,7 +252,8 @@ def elementid_transform(ids, soup, tag, permalinks, perma_set, debug):
     this_string = str(tag.string)
     if debug:
         print(f'name = {tagnav.name}, string = {this_string}')
-    if tagnav.name not in ['[document]', 'code', 'pre']:
+    # not on the top of the tree (see asfhtml.parse), nor in code
+    if not tagnav.hidden and tagnav.name not in ['code', 'pre']:
         m = ELEMENTID_RE.search(tag.string)
         if m:
             # this replacement could be better it truncates and likely drops additional annotations
@@ -262,20 +308,65 @@ def generate_toc(content, tags, title, toc_headers, debug):
         # add the heading.
         node, _new_header = node.add(header)
     # convert the ToC to Beautiful Soup
-    tree_soup = ''
+    tree_tag = ''
     if settoc:
         if debug:
             print('  ToC')
-        # convert the HtmlTreeNode into Beautiful Soup
-        tree_string = '{}'.format(tree)
-        tree_soup = BeautifulSoup(tree_string, 'html.parser')
+        tree_tag = tree.to_tag()
         # Make the ToC available to the theme's template
-        content.toc = tree_soup.decode(formatter='html')
+        content.toc = tree_tag.decode(formatter='html')
     # replace the first [TOC] with the generated table of contents
     for tag in tags:
-        tag.replaceWith(tree_soup)
+        tag.replaceWith(tree_tag)
         # replace additional [TOC] with nothing
-        tree_soup = ''
+        tree_tag = ''
+
+
+# get the genid cache configured in the settings, or None
+def genid_cache(settings):
+    path = settings.get('ASF_GENID_CACHE_DIR', ASF_GENID_CACHE_DIR)
+    if not path:
+        return None
+    if path not in _CACHES:
+        _CACHES[path] = asfcache.DiskCache(path, settings.get('ASF_GENID_CACHE_SIZE', ASF_GENID_CACHE_SIZE),
+                                           'genid cache')
+    return _CACHES[path]
+
+
+# a change to this plugin or its helpers invalidates the cache
+def code_hash():
+    if not _CODE_HASH:
+        h = hashlib.sha256(bs4.__version__.encode('utf-8'))
+        for fname in (__file__, asfhtml.__file__, asfexpand.__file__):
+            with open(fname, 'rb') as f:
+                h.update(f.read())
+        _CODE_HASH.append(h.hexdigest())
+    return _CODE_HASH[0]
+
+
+# The expansions of the {{ key }} that the html can use, including the keys
+# found in those expansions. Only these values of the metadata are part of
+# the cache key, so a change to any other value keeps the page cached.
+def used_metadata(text, expander):
+    used = { }
+    pending = [ html.unescape(text) ]
+    while pending:
+        for m in METADATA_RE.finditer(pending.pop()):
+            key = m.group(1)
+            if key not in used:
+                used[key] = expander.lookup(key)
+                pending.append(used[key][1])
+    return sorted(used.items())
+
+
+def cache_key(text, settings, asf_genid, asf_headings, outline, expander):
+    has_toc = asfhtml.has_toc_marker(text, outline)
+    h = hashlib.sha256()
+    h.update(json.dumps([ CACHE_FORMAT, code_hash(), asfhtml.html_parser(settings), asf_genid, asf_headings,
+                          has_toc, used_metadata(text, expander) ], sort_keys=True, default=str).encode('utf-8'))
+    h.update(b'\0')
+    h.update(text.encode('utf-8'))
+    return h.hexdigest()
 
 
 # create breadcrumb html
@@ -305,6 +396,37 @@ def add_data(content):
             content.metadata.update(asf_metadata)
 
 
+# true if the html has a heading tag without an id attribute
+def missing_heading_id(text, headings_re):
+    heading_re = re.compile(headings_re)
+    for m in SCAN_TAG_RE.finditer(text):
+        if heading_re.search(m.group(1).lower()):
+            # ignore id= inside attribute values
+            if not SCAN_ID_RE.search(SCAN_QUOTED_RE.sub('', m.group(2))):
+                return True
+    return False
+
+
+# Decide from the html text which genid steps can apply to the page.
+# Returns the set of steps that need the parsed html, empty if none.
+def scan_steps(text, asf_genid, asf_headings, outline):
+    steps = set()
+    if asf_genid['metadata'] and '{{' in text:
+        steps.add('metadata')
+    # a character reference may hide any annotation, like expanded metadata
+    if SCAN_ENTITY_RE.search(text):
+        steps.add('metadata')
+    if asf_genid['elements'] and SCAN_ELEMENTID_RE.search(text):
+        steps.add('elements')
+    if asf_headings == 'True' and missing_heading_id(text, asf_genid['headings_re']):
+        steps.add('headings')
+    if asf_genid['tables'] and SCAN_TABLE_RE.search(text):
+        steps.add('tables')
+    if asf_genid['toc'] and asfhtml.has_toc_marker(text, outline):
+        steps.add('toc')
+    return steps
+
+
 # main worker transforming the html
 def generate_id(content):
     if isinstance(content, pelican.contents.Static):
@@ -321,18 +443,15 @@ def generate_id(content):
         for name in content.settings['PLUGINS']:
             print(f'plugin: {name}')
 
-    # track the id tags
-    ids = set()
-    # track permalinks
-    permalinks = set()
-
     # step 1 - fixup html that cmark marks unsafe - move to later?
     if asf_genid['unsafe_tags']:
-        fixup_content(content)
+        if content.settings.get('GFM', { }).get('unsafe'):
+            # gfm rendered the raw html as is. Only the brackets need fixing.
+            fixup_content(content, FIXUP_BRACKETS)
+        else:
+            fixup_content(content)
 
     # step 2 - prepare for genid processes
-    # parse html content into BeautifulSoup4
-    soup = BeautifulSoup(content._content, 'html.parser') # pylint: disable=protected-access
     # page title
     title = content.metadata.get('title', 'Title')
     # assure relative source path is in the metadata
@@ -347,15 +466,98 @@ def generate_id(content):
     # enhance metadata if done by asfreader
     add_data(content)
 
+    # a page without anything to transform is not parsed at all
+    pipeline = asfhtml.pipeline(content)
+    outline = getattr(content, 'outline', None)
+    steps = scan_steps(pipeline.text(), asf_genid, asf_headings, outline)
+    if not steps:
+        if asf_genid['debug']:
+            print('    nothing to transform')
+        return
+    # metadata may expand into anything, so then every enabled step runs
+    if 'metadata' not in steps:
+        asf_genid = dict(asf_genid,
+                         elements='elements' in steps,
+                         tables='tables' in steps,
+                         toc='toc' in steps)
+        if 'headings' not in steps:
+            asf_headings = 'False'
+
+    # a page transformed before, with the same metadata values, comes from the cache
+    expander = asfexpand.Expander(METADATA_RE, content.metadata, asf_genid['debug'])
+    cache = None if asf_genid['debug'] else genid_cache(content.settings)
+    if not cache:
+        transform(content, pipeline, asf_genid, asf_headings, title, expander)
+        return
+    key = cache_key(pipeline.text(), content.settings, asf_genid, asf_headings, outline, expander)
+    entry = cache.load(key)
+    if entry:
+        text, toc, messages = entry
+        pipeline.set_text(text)
+        if toc is not None:
+            content.toc = toc
+        sys.stdout.write(messages)
+        return
+    toc = getattr(content, 'toc', None)
+    messages = io.StringIO()
+    with contextlib.redirect_stdout(messages):
+        transform(content, pipeline, asf_genid, asf_headings, title, expander)
+    sys.stdout.write(messages.getvalue())
+    if getattr(content, 'toc', None) is toc:
+        toc = None
+    else:
+        toc = content.toc
+    # transform() serialized the soup, which stays parsed for later plugins
+    cache.store(key, [ pipeline.text(), toc, messages.getvalue() ])
+
+
+# steps 3 to 10: transform the parsed html of the page
+def transform(content, pipeline, asf_genid, asf_headings, title, expander):
+    # track the id tags
+    ids = IdSet()
+    # track permalinks
+    permalinks = IdSet()
+
+    # parse html content into BeautifulSoup4, unless an earlier plugin did
+    soup = pipeline.parse()
+
+    # one walk of the tree finds everything that steps 3 to 8 transform.
+    # The steps then run in order over what was found, as each one depends
+    # on the ids set by the steps before it across the whole page.
+    if asf_headings == 'True':
+        HEADING_RE = re.compile(asf_genid['headings_re'])
+    else:
+        HEADING_RE = None
+    strings = [ ]
+    id_tags = [ ]
+    headings = [ ]
+    tables = [ ]
+    paragraphs = [ ]
+    for node in soup.descendants:
+        if isinstance(node, Tag):
+            if node.get('id') is not None:
+                id_tags.append(node)
+            if HEADING_RE and HEADING_RE.search(node.name):
+                headings.append(node)
+            if asf_genid['tables'] and TABLE_RE.search(node.name):
+                tables.append(node)
+            if asf_genid['toc'] and node.name == 'p':
+                paragraphs.append(node)
+        elif isinstance(node, NavigableString):
+            if (asf_genid['metadata'] and METADATA_RE.search(node)) or \
+               (asf_genid['elements'] and ELEMENTID_RE.search(node)):
+                strings.append(node)
+
     # step 3 - metadata expansion
     if asf_genid['metadata']:
         if asf_genid['debug']:
             print(f'metadata expansion: {content.relative_source_path}')
-        for tag in soup.findAll(string=METADATA_RE):
-            expand_metadata(tag, content.metadata, asf_genid['debug'])
+        for i, tag in enumerate(strings):
+            if METADATA_RE.search(tag):
+                strings[i] = expand_metadata(tag, expander)
 
     # step 4 - find all id attributes already present
-    for tag in soup.findAll(id=True):
+    for tag in id_tags:
         unique(tag['id'], ids)
         # don't change existing ids
 
@@ -363,33 +565,33 @@ def generate_id(content):
     if asf_genid['elements']:
         if asf_genid['debug']:
             print(f'elementid: {content.relative_source_path}')
-        for tag in soup.findAll(string=ELEMENTID_RE):
-            elementid_transform(ids, soup, tag, asf_genid['permalinks'], permalinks, asf_genid['debug'])
+        for tag in strings:
+            if ELEMENTID_RE.search(tag):
+                elementid_transform(ids, soup, tag, asf_genid['permalinks'], permalinks, asf_genid['debug'])
 
     # step 6 - find all headings w/o ids already present or assigned with {#id} text
     if asf_headings == 'True':
         if asf_genid['debug']:
             print(f'headings: {content.relative_source_path}')
-        # Find heading tags
-        HEADING_RE = re.compile(asf_genid['headings_re'])
-        for tag in soup.findAll(HEADING_RE, id=False):
-            headingid_transform(ids, soup, tag, asf_genid['permalinks'], permalinks)
+        for tag in headings:
+            if tag.get('id') is None:
+                headingid_transform(ids, soup, tag, asf_genid['permalinks'], permalinks)
 
-    # step 7 - find all tables without class
+    # step 7 - set class="table" on all tables (an existing class is replaced)
     if asf_genid['tables']:
         if asf_genid['debug']:
             print(f'tables: {content.relative_source_path}')
-        for tag in soup.findAll(TABLE_RE, _class=False):
+        for tag in tables:
             tag['class'] = 'table'
 
     # step 8 - find TOC tag and generate Table of Contents
     if asf_genid['toc']:
-        tags = soup('p', text='[TOC]')
+        tags = [tag for tag in paragraphs if tag.string == '[TOC]']
         if tags:
             generate_toc(content, tags, title, asf_genid['toc_headers'], asf_genid['debug'])
 
-    # step 9 - reset the html content
-    content._content = soup.decode(formatter='html')  # pylint: disable=protected-access
+    # step 9 - reset the html content from the soup
+    pipeline.changed()
 
     # step 10 - output all of the permalinks created
     if asf_genid['debug']:
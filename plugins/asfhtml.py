@@ -0,0 +1,154 @@
+#!/usr/bin/python -B
+#
+# Licensed to the Apache Software Foundation (ASF) under one
+# or more contributor license agreements.  See the NOTICE file
+# distributed with this work for additional information
+# regarding copyright ownership.  The ASF licenses this file
+# to you under the Apache License, Version 2.0 (the
+# "License"); you may not use this file except in compliance
+# with the License.  You may obtain a copy of the License at
+#
+#   http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing,
+# software distributed under the License is distributed on an
+# "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY
+# KIND, either express or implied.  See the License for the
+# specific language governing permissions and limitations
+# under the License.
+#
+# asfhtml.py -- html parsing shared by the plugins that use Beautiful Soup
+#
+# This is not a Pelican plugin. asfgenid, toc, extract_toc and
+# consensual_youtube import it to share one parse of each page, with the
+# parser that ASF_HTML_PARSER selects:
+#
+#   ASF_HTML_PARSER = 'lxml'         # fast, needs the lxml package
+#   ASF_HTML_PARSER = 'html.parser'  # Python's own parser
+#
+# By default lxml is used when it is installed.
+#
+
+import re
+
+from bs4 import BeautifulSoup, NavigableString, Tag
+
+try:
+    import lxml  # pylint: disable=unused-import
+    DEFAULT_PARSER = 'lxml'
+except ImportError:
+    DEFAULT_PARSER = 'html.parser'
+
+# content that is a whole document, rather than the usual fragment
+DOCUMENT_RE = re.compile(r'<(?:!doctype|html|head|body)[\s>/]', re.I)
+
+
+# A [TOC] marker in the html, inside a tag such as <p>. Loose on purpose:
+# a match only means the page is parsed and searched.
+TOC_MARKER_RE = re.compile(r'>\s*\[TOC\]\s*<')
+
+
+# Whether the html of a page may have a [TOC] paragraph. The gfm reader's
+# outline lists the [TOC] written in markdown, but not one written as raw
+# html, so the html is searched when the outline has none.
+def has_toc_marker(text, outline):
+    if '[TOC]' not in text:
+        return False
+    if outline is None or any(entry['type'] == 'toc' for entry in outline):
+        return True
+    return bool(TOC_MARKER_RE.search(text))
+
+
+def html_parser(settings):
+    return settings.get('ASF_HTML_PARSER') or DEFAULT_PARSER
+
+
+# Parse the html of a page or fragment into Beautiful Soup.
+#
+# lxml places a fragment into <html><body>...</body></html>, after moving
+# leading comments and <style> out of the body. Opening the body first
+# keeps the fragment in order, and the two wrappers are hidden, like the
+# BeautifulSoup object itself, so the soup decodes back into a fragment.
+# A plugin that looks for the top of the tree checks for a hidden parent
+# rather than the name '[document]'.
+def parse(text, settings):
+    parser = html_parser(settings)
+    if parser == 'html.parser' or DOCUMENT_RE.search(text):
+        return BeautifulSoup(text, 'html.parser')
+    soup = BeautifulSoup('<body>' + text, parser)
+    soup.html.hidden = True
+    soup.body.hidden = True
+    return soup
+
+
+# Append the nested lists of a table of contents to the tag parent. root is
+# the top of a tree of nodes with children; each node below it has the text
+# and id of a heading. The tags are built directly rather than parsed from
+# html, so the heading text is escaped when the page is serialized, and a
+# deep outline needs no recursion.
+def toc_lists(root, parent):
+    stack = [ (root, parent) ]
+    while stack:
+        node, tag = stack.pop()
+        if node.children:
+            ul = Tag(name='ul')
+            tag.append(ul)
+            for child in node.children:
+                link = Tag(name='a', attrs={ 'class': 'toc-href', 'href': f'#{child.id}', 'title': child.header })
+                if child.header:
+                    link.append(NavigableString(child.header))
+                li = Tag(name='li')
+                li.append(link)
+                ul.append(li)
+                stack.append((child, li))
+
+
+# The parsed html of a page, shared by the plugins that transform it during
+# content_object_init. The first plugin to need the soup parses the page,
+# and later plugins change the same tree. The order of the receivers is not
+# known, so each plugin that changes the soup serializes it into
+# content._content when it is done, and every other receiver sees its
+# changes: a page is parsed once, but serialized by each plugin that
+# changed it. A receiver outside the pipeline that replaces
+# content._content has the soup parsed again from its text.
+class Pipeline:
+    def __init__(self, content):
+        self.content = content
+        self.soup = None
+        # the text that the soup was parsed from or serialized to
+        self.source = None
+
+    # the soup of the page, parsed on first use and after the text was replaced
+    def parse(self):
+        text = self.content._content # pylint: disable=protected-access
+        if self.soup is None or text is not self.source:
+            self.soup = parse(text, self.content.settings)
+            self.source = text
+        return self.soup
+
+    # a plugin changed the soup: serialize it with the plugin's formatter
+    def changed(self, formatter='html'):
+        self.source = self.content._content = self.soup.decode(formatter=formatter) # pylint: disable=protected-access
+
+    # the html text of the page, including any changes to the soup
+    def text(self):
+        return self.content._content # pylint: disable=protected-access
+
+    # replace the html text of the page; the soup is parsed again when needed
+    def set_text(self, text):
+        self.content._content = text # pylint: disable=protected-access
+        self.soup = None
+        self.source = None
+
+
+# The pipeline of the page whose content_object_init receivers are running.
+# Pelican initializes one page at a time, so the next page replaces it and
+# the soup of the page before is freed.
+_PIPELINE = None
+
+
+def pipeline(content):
+    global _PIPELINE  # pylint: disable=global-statement
+    if _PIPELINE is None or _PIPELINE.content is not content:
+        _PIPELINE = Pipeline(content)
+    return _PIPELINE
@@ -0,0 +1,275 @@
+#!/usr/bin/python -B
+#
+# Licensed to the Apache Software Foundation (ASF) under one
+# or more contributor license agreements.  See the NOTICE file
+# distributed with this work for additional information
+# regarding copyright ownership.  The ASF licenses this file
+# to you under the Apache License, Version 2.0 (the
+# "License"); you may not use this file except in compliance
+# with the License.  You may obtain a copy of the License at
+#
+#   http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing,
+# software distributed under the License is distributed on an
+# "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY
+# KIND, either express or implied.  See the License for the
+# specific language governing permissions and limitations
+# under the License.
+#
+# asfpool.py -- Pelican plugin that processes pages in a pool of processes
+#
+# Pelican reads each page and runs the content_object_init plugins over
+# it (asfgenid, toc, spu, consensual_youtube, ...) on one core. With
+#
+#   ASF_PAGE_WORKERS = 16
+#
+# the pages are read by a ProcessPoolExecutor instead: a worker runs the
+# reader and the content_object_init receivers for one page, and returns
+# what they produced. Pelican then reads the page as usual, but takes the
+# reader's output and the receivers' changes from the worker rather than
+# doing that work again. 0 or 1 reads every page serially.
+#
+# The workers are forked, so they share the settings, ASF_DATA and the
+# loaded plugins without pickling them. Only the path of a page goes to a
+# worker, and only strings, dates and other picklable values come back.
+# ASF_DATA values in the metadata come back as a reference to the value in
+# the main process. A page whose results cannot be pickled, or that fails
+# in the worker, is read serially. When a worker dies or the pool breaks,
+# the pages that are left are all read serially.
+#
+# Every content_object_init receiver runs in the worker, so a plugin that
+# collects pages in the main process must use another signal.
+#
+
+import os
+import multiprocessing
+import concurrent.futures
+import pickle
+import sys
+import traceback
+
+import pelican.contents
+import pelican.plugins.signals
+
+ASF_PAGE_WORKERS = os.cpu_count() or 1
+
+# the pool of the page generator, inherited by the workers
+_POOL = None
+
+
+# a value of the ASF_DATA metadata, sent by its key
+class AsfData:
+    def __init__(self, key):
+        self.key = key
+
+
+class PagePool:
+    def __init__(self, generator, workers):
+        self.generator = generator
+        self.workers = workers
+        self.read_file = generator.readers.read_file
+        self.executor = None
+        # the chunks of pages sent to the workers
+        self.futures = [ ]
+        # (path, result) in the order the pages are read
+        self.results = iter(())
+        self.done = { }
+        self.pooled = 0
+        self.serial = 0
+
+    # start reading the pages that the generator will read
+    def start(self):
+        generator = self.generator
+        paths = [ ]
+        for path in generator.get_files(generator.settings['PAGE_PATHS'],
+                                        exclude=generator.settings['PAGE_EXCLUDES']):
+            if generator.get_cached_data(path, None) is None and \
+               file_suffix(path) in generator.readers.readers:
+                paths.append(path)
+        if not paths:
+            return
+        print(f'asfpool: reading {len(paths)} pages with {self.workers} workers')
+        self.executor = concurrent.futures.ProcessPoolExecutor(
+            max_workers=self.workers, mp_context=multiprocessing.get_context('fork'))
+        # a forked worker would repeat what is still buffered
+        sys.stdout.flush()
+        sys.stderr.flush()
+        chunksize = max(1, len(paths) // (self.workers * 4))
+        chunks = [ paths[i:i + chunksize] for i in range(0, len(paths), chunksize) ]
+        try:
+            self.futures = [ self.executor.submit(process_pages, chunk) for chunk in chunks ]
+        except Exception as e:  # e.g. a daemon process cannot have children
+            print(f'asfpool: cannot start the workers, pages are read serially: {e}')
+            self.shutdown()
+            return
+        self.results = self.chunk_results(chunks, self.futures)
+
+    def chunk_results(self, chunks, futures):
+        for chunk, future in zip(chunks, futures):
+            yield from zip([ os.path.abspath(os.path.join(self.generator.path, path)) for path in chunk ],
+                           future.result())
+
+    # the worker's result for a page, None if it has to be read serially
+    def result(self, path):
+        while path not in self.done:
+            try:
+                done_path, data = next(self.results)
+            except StopIteration:
+                self.shutdown()
+                return None
+            except Exception as e:  # e.g. BrokenProcessPool, when a worker was killed
+                print(f'asfpool: the workers failed, the other pages are read serially: {e!r}')
+                self.shutdown()
+                return None
+            self.done[done_path] = data
+        data = self.done.pop(path)
+        return pickle.loads(data) if data else None
+
+    # the pages that are not read yet are dropped. (shutdown(cancel_futures=True)
+    # needs Python 3.9.)
+    def shutdown(self):
+        for future in self.futures:
+            future.cancel()
+        self.futures = [ ]
+        if self.executor:
+            self.executor.shutdown(wait=True)
+            self.executor = None
+
+
+# the reader format of a path, as Pelican's Readers.read_file finds it
+def file_suffix(path):
+    return os.path.splitext(os.path.basename(path))[1][1:]
+
+
+# the metadata values that were ASF_DATA are sent by key
+def encode(values, settings):
+    asf_metadata = settings.get('ASF_DATA', { }).get('metadata') or { }
+    return { k: AsfData(k) if k in asf_metadata and v is asf_metadata[k] else v for k, v in values.items() }
+
+
+def decode(values, settings):
+    asf_metadata = settings.get('ASF_DATA', { }).get('metadata') or { }
+    return { k: asf_metadata[v.key] if isinstance(v, AsfData) else v for k, v in values.items() }
+
+
+# the keys of after that are new or changed since before, and the keys removed
+def changes(before, after, ignore=()):
+    changed = { k: v for k, v in after.items() if k not in ignore and (k not in before or before[k] is not v) }
+    removed = [ k for k in before if k not in after and k not in ignore ]
+    return changed, removed
+
+
+# Read one page in a worker. Returns the pickled result, or None.
+def process_page(path):
+    generator = _POOL.generator
+    reader = generator.readers.readers[file_suffix(path)]
+    read = reader.read
+    output = [ ]
+
+    def read_source(source_path):
+        output.append(read(source_path))
+        return output[-1]
+
+    try:
+        reader.read = read_source
+        with pelican.plugins.signals.content_object_init.muted():
+            page = _POOL.read_file(base_path=generator.path, path=path,
+                                   content_class=pelican.contents.Page, context=generator.context,
+                                   preread_signal=pelican.plugins.signals.page_generator_preread,
+                                   preread_sender=generator,
+                                   context_signal=pelican.plugins.signals.page_generator_context,
+                                   context_sender=generator)
+        if not output or not isinstance(page, pelican.contents.Page):
+            return None
+        metadata = dict(page.metadata)
+        attrs = dict(vars(page))
+        pelican.plugins.signals.content_object_init.send(page)
+        content, reader_metadata = output[-1]
+        settings = generator.settings
+        changed, removed = changes(metadata, page.metadata)
+        result = {
+            'reader': (content, encode(reader_metadata, settings)),
+            'content': page._content,  # pylint: disable=protected-access
+            'metadata': (encode(changed, settings), removed),
+        }
+        changed, removed = changes(attrs, vars(page), ignore=('_content', 'metadata'))
+        result['attrs'] = (encode(changed, settings), removed)
+        return pickle.dumps(result)
+    except Exception:
+        # reading the page serially reports the problem, or the values that cannot be pickled
+        if generator.settings.get('DEBUG'):
+            traceback.print_exc()
+        return None
+    finally:
+        del reader.read
+        # write the messages of each page together
+        sys.stdout.flush()
+
+
+# Read a chunk of pages in a worker.
+def process_pages(paths):
+    return [ process_page(path) for path in paths ]
+
+
+# read a page with the results of its worker
+def read_file(base_path, path, **kwargs):
+    result = _POOL.result(os.path.abspath(os.path.join(base_path, path)))
+    if result is None:
+        _POOL.serial += 1
+        return _POOL.read_file(base_path, path, **kwargs)
+    _POOL.pooled += 1
+
+    settings = _POOL.generator.settings
+    reader = _POOL.generator.readers.readers[file_suffix(path)]
+    content, reader_metadata = result['reader']
+    reader_metadata = decode(reader_metadata, settings)
+    reader.read = lambda source_path: (content, reader_metadata)
+    try:
+        with pelican.plugins.signals.content_object_init.muted():
+            page = _POOL.read_file(base_path, path, **kwargs)
+    finally:
+        del reader.read
+    page._content = result['content']  # pylint: disable=protected-access
+    changed, removed = result['metadata']
+    page.metadata.update(decode(changed, settings))
+    for key in removed:
+        del page.metadata[key]
+    changed, removed = result['attrs']
+    for key, value in decode(changed, settings).items():
+        setattr(page, key, value)
+    for key in removed:
+        delattr(page, key)
+    return page
+
+
+def start_pool(generator):
+    global _POOL  # pylint: disable=global-statement
+    workers = generator.settings.get('ASF_PAGE_WORKERS', ASF_PAGE_WORKERS)
+    if not workers or workers < 2:
+        return
+    if 'fork' not in multiprocessing.get_all_start_methods():
+        print('asfpool: processes cannot be forked here, pages are read serially')
+        return
+    _POOL = PagePool(generator, workers)
+
+    # start the workers when the generator reads its first page
+    def first_read(base_path, path, **kwargs):
+        generator.readers.read_file = read_file
+        _POOL.start()
+        return read_file(base_path, path, **kwargs)
+
+    generator.readers.read_file = first_read
+
+
+def stop_pool(_generator):
+    global _POOL  # pylint: disable=global-statement
+    if _POOL:
+        _POOL.shutdown()
+        print(f'asfpool: {_POOL.pooled} pages read by the workers, {_POOL.serial} serially')
+        _POOL = None
+
+
+def register():
+    pelican.plugins.signals.page_generator_init.connect(start_pool)
+    pelican.plugins.signals.page_generator_finalized.connect(stop_pool)
@@ -36,6 +36,11 @@ import pelican.settings
 ### TODO: maybe buildsite.py can sort gfm to the front of the list.
 import gfm
 
+# asfexpand is not a plugin. It is a helper module next to this one.
+if os.path.dirname(os.path.abspath(__file__)) not in sys.path:
+    sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+import asfexpand  # pylint: disable=wrong-import-position
+
 
 METADATA_RE = re.compile(r'\[{\s*(?P<meta>[-._:a-zA-Z0-9\[\]]+)\s*}\]')
 
@@ -66,20 +71,7 @@ class ASFReader(gfm.GFMReader):
         if asf_metadata:
             metadata.update(asf_metadata)
             # insert any direct references
-            m = 1
-            while m:
-                m = METADATA_RE.search(text)
-                if m:
-                    this_data = m.group(1).strip()
-                    format_string = '{{{0}}}'.format(this_data)
-                    try:
-                        new_string = format_string.format(**metadata)
-                        print(f'{{{{{m.group(1)}}}}} -> {new_string}')
-                    except Exception:
-                        # the data expression was not found
-                        new_string = format_string
-                        print(f'{{{{{m.group(1)}}}}} is not found')
-                    text = re.sub(METADATA_RE, new_string, text, count=1)
+            text = asfexpand.Expander(METADATA_RE, metadata).expand(text)
         return text, metadata
 
     def read(self, source_path):
@@ -101,7 +93,8 @@ class ASFReader(gfm.GFMReader):
             fp = io.StringIO()
             template.generate(fp, metadata)
             # Render the markdown into HTML
-            content = super().render(fp.getvalue().encode('utf-8')).decode('utf-8')
+            content, metadata['outline'] = gfm.render_gfm(fp.getvalue().encode('utf-8'),
+                                                          *gfm.render_flavor(self.settings))
             assert content
         except Exception:
             print('-----', file=sys.stderr)
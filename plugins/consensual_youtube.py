@@ -30,13 +30,17 @@
 # The preview image will be taken from `img/{youtube_id}.jpg` in your content
 # folder. If no preview image is found there, it will be fetched from youtube
 # at site generation time.
+import sys
 from os import path
 
 from urllib import request
 
 from pelican import contents, signals
 
-from bs4 import BeautifulSoup
+# asfhtml is not a plugin. It is a helper module next to this one.
+if path.dirname(path.abspath(__file__)) not in sys.path:
+    sys.path.append(path.dirname(path.abspath(__file__)))
+import asfhtml  # pylint: disable=wrong-import-position
 
 CSS_STYLE = '''
     .yt-container {
@@ -95,7 +99,8 @@ JS_SCRIPT = '''
 def generate_youtube(content):
     if isinstance(content, contents.Static):
         return
-    soup = BeautifulSoup(content._content, 'html.parser') # pylint: disable=protected-access
+    pipeline = asfhtml.pipeline(content)
+    soup = pipeline.parse()
     tags = soup.find_all('youtube')
 
     if not tags:
@@ -112,7 +117,7 @@ def generate_youtube(content):
     for tag in tags:
         replace_tag(content.settings['PATH'], content.settings['OUTPUT_PATH'], soup, tag)
 
-    content._content = soup.decode(formatter='html') # pylint: disable=protected-access
+    pipeline.changed()
 
 def replace_tag(input_path, output_path, soup, tag):
     tag.name = 'div'
@@ -6,11 +6,17 @@ A Pelican plugin to extract table of contents (ToC) from `article.content` and
 place it in its own `article.toc` variable for use in templates.
 """
 
+import sys
 from os import path
 from bs4 import BeautifulSoup
 from pelican import signals, readers, contents
 import logging
 
+# asfhtml is a helper module in the plugins directory, above this package
+if path.dirname(path.dirname(path.abspath(__file__))) not in sys.path:
+    sys.path.append(path.dirname(path.dirname(path.abspath(__file__))))
+import asfhtml
+
 logger = logging.getLogger(__name__)
 
 
@@ -18,7 +24,8 @@ def extract_toc(content):
     if isinstance(content, contents.Static):
         return
 
-    soup = BeautifulSoup(content._content, 'html.parser')
+    pipeline = asfhtml.pipeline(content)
+    soup = pipeline.parse()
     filename = content.source_path
     extension = path.splitext(filename)[1][1:]
     toc = None
@@ -55,7 +62,7 @@ def extract_toc(content):
 
     if toc:
         toc.extract()
-        content._content = soup.decode()
+        pipeline.changed(formatter='minimal')
         content.toc = toc.decode()
         if content.toc.startswith('<html>'):
             content.toc = content.toc[12:-14]
@@ -21,16 +21,28 @@
 # gfm_reader.py -- GitHub-Flavored Markdown reader for Pelican
 #
 
-import sys
+import os
 import os.path
 import ctypes
+import codecs
+import mmap
 import re
 import platform
+import fnmatch
+import sys
+import hashlib
+import tempfile
+import concurrent.futures
 
 import pelican.utils
 import pelican.plugins.signals
 import pelican.readers
 
+# asfcache is not a plugin. It is a helper module next to this one.
+if os.path.dirname(os.path.abspath(__file__)) not in sys.path:
+    sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+import asfcache  # pylint: disable=wrong-import-position
+
 _LIBDIR = os.environ['LIBCMARKDIR']
 if platform.system() == 'Darwin':
     _LIBEXT = '.dylib'
@@ -90,10 +102,92 @@ F_cmark_find_syntax_extension = cmark.cmark_find_syntax_extension
 F_cmark_find_syntax_extension.restype = ctypes.c_void_p
 F_cmark_find_syntax_extension.argtypes = (ctypes.c_char_p,)
 
+# The result is malloc'd by cmark and must be released with cmark's allocator.
+# Keep it as a raw pointer; a c_char_p restype would copy it and leak it.
 F_cmark_render_html = cmark.cmark_render_html
-F_cmark_render_html.restype = ctypes.c_char_p
+F_cmark_render_html.restype = ctypes.c_void_p
 F_cmark_render_html.argtypes = (ctypes.c_void_p, ctypes.c_int, ctypes.c_void_p)
 
+class CmarkMem(ctypes.Structure):
+    "struct cmark_mem: the allocator cmark uses for nodes and rendered output."
+    _fields_ = [
+        ('calloc', ctypes.CFUNCTYPE(ctypes.c_void_p, ctypes.c_size_t, ctypes.c_size_t)),
+        ('realloc', ctypes.CFUNCTYPE(ctypes.c_void_p, ctypes.c_void_p, ctypes.c_size_t)),
+        ('free', ctypes.CFUNCTYPE(None, ctypes.c_void_p)),
+    ]
+
+F_cmark_get_default_mem_allocator = cmark.cmark_get_default_mem_allocator
+F_cmark_get_default_mem_allocator.restype = ctypes.POINTER(CmarkMem)
+F_cmark_get_default_mem_allocator.argtypes = ( )
+
+# cmark_parser_new() uses the default allocator, so its output is freed with it
+F_cmark_free = F_cmark_get_default_mem_allocator().contents.free
+
+# Used to size the rendered output buffer, so it can be decoded in place
+F_strlen = ctypes.CDLL(None).strlen
+F_strlen.restype = ctypes.c_size_t
+F_strlen.argtypes = (ctypes.c_void_p,)
+
+F_cmark_iter_new = cmark.cmark_iter_new
+F_cmark_iter_new.restype = ctypes.c_void_p
+F_cmark_iter_new.argtypes = (ctypes.c_void_p,)
+
+F_cmark_iter_next = cmark.cmark_iter_next
+F_cmark_iter_next.restype = ctypes.c_int
+F_cmark_iter_next.argtypes = (ctypes.c_void_p,)
+
+F_cmark_iter_get_node = cmark.cmark_iter_get_node
+F_cmark_iter_get_node.restype = ctypes.c_void_p
+F_cmark_iter_get_node.argtypes = (ctypes.c_void_p,)
+
+F_cmark_iter_free = cmark.cmark_iter_free
+F_cmark_iter_free.restype = None
+F_cmark_iter_free.argtypes = (ctypes.c_void_p,)
+
+F_cmark_node_get_type_string = cmark.cmark_node_get_type_string
+F_cmark_node_get_type_string.restype = ctypes.c_char_p
+F_cmark_node_get_type_string.argtypes = (ctypes.c_void_p,)
+
+F_cmark_node_get_literal = cmark.cmark_node_get_literal
+F_cmark_node_get_literal.restype = ctypes.c_char_p
+F_cmark_node_get_literal.argtypes = (ctypes.c_void_p,)
+
+F_cmark_node_get_heading_level = cmark.cmark_node_get_heading_level
+F_cmark_node_get_heading_level.restype = ctypes.c_int
+F_cmark_node_get_heading_level.argtypes = (ctypes.c_void_p,)
+
+F_cmark_node_get_start_line = cmark.cmark_node_get_start_line
+F_cmark_node_get_start_line.restype = ctypes.c_int
+F_cmark_node_get_start_line.argtypes = (ctypes.c_void_p,)
+
+F_cmark_node_get_start_column = cmark.cmark_node_get_start_column
+F_cmark_node_get_start_column.restype = ctypes.c_int
+F_cmark_node_get_start_column.argtypes = (ctypes.c_void_p,)
+
+F_cmark_node_parent = cmark.cmark_node_parent
+F_cmark_node_parent.restype = ctypes.c_void_p
+F_cmark_node_parent.argtypes = (ctypes.c_void_p,)
+
+F_cmark_node_get_list_tight = cmark.cmark_node_get_list_tight
+F_cmark_node_get_list_tight.restype = ctypes.c_int
+F_cmark_node_get_list_tight.argtypes = (ctypes.c_void_p,)
+
+F_cmark_node_first_child = cmark.cmark_node_first_child
+F_cmark_node_first_child.restype = ctypes.c_void_p
+F_cmark_node_first_child.argtypes = (ctypes.c_void_p,)
+
+F_cmark_node_next = cmark.cmark_node_next
+F_cmark_node_next.restype = ctypes.c_void_p
+F_cmark_node_next.argtypes = (ctypes.c_void_p,)
+
+# cmark_event_type
+CMARK_EVENT_DONE = 1
+CMARK_EVENT_ENTER = 2
+
+F_cmark_version_string = cmark.cmark_version_string
+F_cmark_version_string.restype = ctypes.c_char_p
+F_cmark_version_string.argtypes = ( )
+
 
 # Set up the libcmark-gfm library and its extensions
 F_register = getattr(cmark_ext, ENSURE_REGISTERED)
@@ -103,11 +197,10 @@ F_register()
 
 ### technically, maybe install an atexit() to release the plugins
 
-# Options for the GFM rendering call
-### this could be moved into SETTINGS or somesuch, but meh. not needed now.
+# Default options for the GFM rendering call
 OPTS = 0
 
-# The GFM extensions that we want to use
+# The default GFM extensions that we want to use
 EXTENSIONS = (
     'autolink',
     'table',
@@ -115,6 +208,123 @@ EXTENSIONS = (
     'tagfilter',
 )
 
+# cmark options that a site may name in its GFM setting
+CMARK_OPTIONS = {
+    'sourcepos': 1 << 1,
+    'hardbreaks': 1 << 2,
+    'nobreaks': 1 << 4,
+    'validate_utf8': 1 << 9,
+    'smart': 1 << 10,
+    'github_pre_lang': 1 << 11,
+    'liberal_html_tag': 1 << 12,
+    'footnotes': 1 << 13,
+    'strikethrough_double_tilde': 1 << 14,
+    'table_prefer_style_attributes': 1 << 15,
+    'full_info_string': 1 << 16,
+    'unsafe': 1 << 17,  # cmark-gfm 0.29 and later omit raw html without this
+}
+
+# Per-site rendering can be configured in the settings:
+#
+# GFM = {
+#     'unsafe': True,             # trusted site: render raw html, including
+#                                 # <script>, <style> and <iframe>, as is
+#     'options': ['smart'],       # more CMARK_OPTIONS
+#     'extensions': ['autolink'], # replaces EXTENSIONS
+# }
+#
+# 'unsafe' removes the tagfilter extension, so asfgenid has no escaped
+# tags to fix up afterwards.
+
+# Number of threads used to pre-render the markdown pages during
+# initialization. ctypes releases the GIL while inside libcmark-gfm, so
+# the renders run concurrently. Override with GFM_RENDER_WORKERS in the
+# settings; 0 or 1 disables pre-rendering.
+GFM_RENDER_WORKERS = os.cpu_count() or 1
+
+# Pre-rendered pages: absolute source path -> (markdown bytes, (html, outline))
+_PRERENDERED: dict = { }
+
+# On-disk cache of rendered html, keyed by a hash of the markdown and of
+# everything that affects how cmark renders it. Override the location
+# with GFM_CACHE_DIR (None disables the cache) and the maximum number of
+# cached pages with GFM_CACHE_SIZE.
+GFM_CACHE_DIR = os.path.join(tempfile.gettempdir(), 'gfm-cache')
+GFM_CACHE_SIZE = 50000
+
+
+class RenderCache(asfcache.DiskCache):
+    """Content-addressed cache of cmark output, as [html, outline]."""
+
+    # bump when the format of an entry changes
+    FORMAT = 2
+
+    def key(self, text, flavor):
+        opts, extensions = flavor
+        h = hashlib.sha256()
+        h.update(f'{self.FORMAT}\0'.encode('utf-8'))
+        h.update(F_cmark_version_string())
+        h.update(f'\0{opts}\0{",".join(extensions)}\0'.encode('utf-8'))
+        h.update(text)
+        return h.hexdigest()
+
+    def get(self, text, flavor):
+        "Return (html, outline) for the markdown rendered with flavor, or None."
+        value = self.load(self.key(text, flavor))
+        if value is None:
+            return None
+        html, outline = value
+        return html, outline
+
+    def put(self, text, flavor, html, outline):
+        self.store(self.key(text, flavor), [html, outline])
+
+
+# Open RenderCache instances, by directory
+_CACHES: dict = { }
+
+
+# get the render cache configured in the settings, or None
+def render_cache(settings):
+    path = settings.get('GFM_CACHE_DIR', GFM_CACHE_DIR)
+    if not path:
+        return None
+    if path not in _CACHES:
+        _CACHES[path] = RenderCache(path, settings.get('GFM_CACHE_SIZE', GFM_CACHE_SIZE), 'gfm cache')
+    return _CACHES[path]
+
+
+# get the (OPTS, EXTENSIONS) flavor of GFM configured in the settings
+def render_flavor(settings):
+    config = settings.get('GFM', { })
+    opts = OPTS
+    for name in config.get('options', [ ]):
+        if name not in CMARK_OPTIONS:
+            raise ValueError(f'GFM options: unknown cmark option {name!r}; '
+                             f'the options are {", ".join(sorted(CMARK_OPTIONS))}')
+        opts |= CMARK_OPTIONS[name]
+    extensions = tuple(config.get('extensions', EXTENSIONS))
+    for name in extensions:
+        if not F_cmark_find_syntax_extension(name.encode('utf-8')):
+            raise ValueError(f'GFM extensions: unknown cmark extension {name!r}; '
+                             f'the cmark-gfm extensions are {", ".join(EXTENSIONS)} and tasklist')
+    if config.get('unsafe'):
+        opts |= CMARK_OPTIONS['unsafe']
+        extensions = tuple(name for name in extensions if name != 'tagfilter')
+    return opts, extensions
+
+
+# render with the cache, if there is one. Returns (html, outline)
+def cached_render(cache, text, flavor):
+    if cache:
+        result = cache.get(text, flavor)
+        if result is not None:
+            return result
+    html, outline = render_gfm(text, *flavor)
+    if cache:
+        cache.put(text, flavor, html, outline)
+    return html, outline
+
 
 class GFMReader(pelican.readers.BaseReader):
     enabled = True
@@ -136,11 +346,30 @@ class GFMReader(pelican.readers.BaseReader):
     # Note: name starts in column 0, no whitespace before colon, will be
     #       made lower-case, and value will be stripped
     #
-    RE_METADATA = re.compile('^([A-za-z]+): (.*)$')
+    # The header is scanned as UTF-8 bytes, before any decoding.
+    #
+    RE_METADATA = re.compile(b'^([A-za-z]+): (.*)$')
+    # the line endings that str.splitlines() finds in a header
+    RE_LINE_END = re.compile(b'\r\n?|\n')
+
+    # Sources at least this large are memory-mapped rather than read
+    MMAP_THRESHOLD = 256 * 1024
 
     def read_source(self, source_path):
         "Read metadata and content from the source."
 
+        text, metadata, _header_lines = self.read_source_bytes(source_path)
+        return text.decode('utf-8'), metadata
+
+    def read_source_bytes(self, source_path):
+        """Read metadata and content from the source.
+
+        Only the metadata header is examined. The content is returned as a
+        single slice of the file's UTF-8 bytes, ready to hand to cmark.
+        Returns (text, metadata, header_lines), where header_lines is the
+        number of lines before the content.
+        """
+
         # Prepare the "slug", which is the target file name. It will be the
         # same as the source file, minus the leading ".../content/(articles|pages)"
         # and with the extension removed (Pelican will add .html)
@@ -152,19 +381,28 @@ class GFMReader(pelican.readers.BaseReader):
         metadata = {
             'slug': slug,
         }
-        # Fetch the source content, with a few appropriate tweaks
-        with pelican.utils.pelican_open(source_path) as text:
+        # Fetch the source content
+        with open(source_path, 'rb') as f:
+            if os.fstat(f.fileno()).st_size >= GFMReader.MMAP_THRESHOLD:
+                buf = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+            else:
+                buf = f.read()
+        try:
+            # skip a byte order mark, as pelican_open() does
+            pos = len(codecs.BOM_UTF8) if buf[:len(codecs.BOM_UTF8)] == codecs.BOM_UTF8 else 0
 
             # Extract the metadata from the header of the text
-            lines = text.splitlines()
-            i = 0 # See https://github.com/apache/infrastructure-pelican/issues/70
-            for i in range(len(lines)):
-                line = lines[i]
+            start = pos # See https://github.com/apache/infrastructure-pelican/issues/70
+            while pos < len(buf):
+                line_end = GFMReader.RE_LINE_END.search(buf, pos)
+                end, following = line_end.span() if line_end else (len(buf), len(buf))
+                line = buf[pos:end]
+                start = pos
                 match = GFMReader.RE_METADATA.match(line)
                 if match:
-                    name = match.group(1).strip().lower()
+                    name = match.group(1).decode('utf-8').strip().lower()
                     if name != 'slug':
-                        value = match.group(2).strip()
+                        value = match.group(2).decode('utf-8').strip()
                         if name == 'date':
                             value = pelican.utils.get_date(value)
                     metadata[name] = value
@@ -172,10 +410,11 @@ class GFMReader(pelican.readers.BaseReader):
                     #  print 'META:', name, value
                 elif not line.strip():
                     # blank line
-                    continue
+                    pass
                 else:
                     # reached actual content
                     break
+                pos = following
 
             # Redo the slug for articles.
             # depending on pelicanconf.py this will change the output filename
@@ -184,54 +423,267 @@ class GFMReader(pelican.readers.BaseReader):
                     metadata['title'],
                     self.settings.get('SLUG_SUBSTITUTIONS', ()))
 
-            # Reassemble content, minus the metadata
-            text = '\n'.join(lines[i:])
+            # The content, minus the metadata
+            text = buf[start:]
+            header_lines = len(GFMReader.RE_LINE_END.findall(buf, 0, start))
+        finally:
+            if isinstance(buf, mmap.mmap):
+                buf.close()
 
-            return text, metadata
+        return text, metadata, header_lines
 
     def read(self, source_path):
         "Read metadata and content then render into HTML."
 
         # read metadata and markdown content
-        text, metadata = self.read_source(source_path)
+        text, metadata, header_lines = self.read_source_bytes(source_path)
         assert text, 'Text must not be empty'
         assert metadata, 'Metadata must not be empty'
         # Render the markdown into HTML
-        if sys.version_info >= (3, 0):
-            text = text.encode('utf-8')
-            content = self.render(text).decode('utf-8')
-        else:
-            content = self.render(text)
+        result = prerendered(source_path, text)
+        if result is None:
+            result = cached_render(render_cache(self.settings), text, render_flavor(self.settings))
+        content, outline = result
         assert content, 'Did not expect content to be empty'
+        # cmark counts the lines of the content; the outline gives lines of the source
+        metadata['outline'] = [ dict(entry, line=entry['line'] + header_lines) for entry in outline ]
 
         return content, metadata
 
     def render(self, text):
         "Use cmark-gfm to render the Markdown into an HTML fragment."
 
-        parser = F_cmark_parser_new(OPTS)
-        assert parser, 'Failed to initialise parser'
-        for name in EXTENSIONS:
-            ext = F_cmark_find_syntax_extension(name.encode('utf-8'))
-            assert ext, 'Failed to find UTF-8 extension'
-            rv = F_cmark_parser_attach_syntax_extension(parser, ext)
-            assert rv, 'Failed to attach the UTF-8 extension'
-        exts = F_cmark_parser_get_syntax_extensions(parser)
-        F_cmark_parser_feed(parser, text, len(text))
-        doc = F_cmark_parser_finish(parser)
-        assert doc, 'Did not expect rendered output to be empty'
+        return render_gfm(text, *render_flavor(self.settings))[0]
+
+
+def render_gfm(text, opts=OPTS, extensions=EXTENSIONS):
+    """Render Markdown (bytes) into an HTML fragment (str) and its outline.
+
+    Returns (html, outline). See walk_outline() for the outline.
+    Safe to call from threads.
+    """
+
+    parser = F_cmark_parser_new(opts)
+    assert parser, 'Failed to initialise parser'
+    for name in extensions:
+        ext = F_cmark_find_syntax_extension(name.encode('utf-8'))
+        assert ext, 'Failed to find UTF-8 extension'
+        rv = F_cmark_parser_attach_syntax_extension(parser, ext)
+        assert rv, 'Failed to attach the UTF-8 extension'
+    exts = F_cmark_parser_get_syntax_extensions(parser)
+    F_cmark_parser_feed(parser, text, len(text))
+    doc = F_cmark_parser_finish(parser)
+    assert doc, 'Did not expect rendered output to be empty'
+
+    # only a page that mentions TOC can have a [TOC] paragraph
+    outline = walk_outline(doc, b'TOC' in text)
+    buf = F_cmark_render_html(doc, opts, exts)
+    assert buf, 'Failed to render html'
+
+    F_cmark_parser_free(parser)
+    F_cmark_node_free(doc)
+
+    # decode directly from cmark's buffer, then release it
+    try:
+        output = str((ctypes.c_char * F_strlen(buf)).from_address(buf), 'utf-8')
+    finally:
+        F_cmark_free(buf)
+
+    return output, outline
 
-        output = F_cmark_render_html(doc, OPTS, exts)
 
-        F_cmark_parser_free(parser)
-        F_cmark_node_free(doc)
+def walk_outline(doc, find_toc=True):
+    """Walk the cmark node tree and return the document outline.
 
-        return output
+    The outline lists, in document order, every heading and every [TOC]
+    paragraph as a dict:
+
+        {'type': 'heading', 'level': 2, 'text': 'Section', 'line': 12, 'column': 1}
+        {'type': 'toc', 'level': 0, 'text': '[TOC]', 'line': 5, 'column': 1}
+
+    'text' is the plain text of the heading, with inline markup and raw html
+    removed. 'line' and 'column' are the 1-based position in the markdown
+    handed to cmark, which excludes the metadata header. GFMReader.read()
+    adds the lines of the header, so content.outline has the position in
+    the source file. For asfreader pages it is the position in the
+    markdown that ezt generated.
+
+    Plugins get this as content.outline, and can use it to find headings
+    and [TOC] markers without parsing the html. A [TOC] written as raw html,
+    such as <p>[TOC]</p>, is not in the outline; see asfhtml.has_toc_marker().
+    With find_toc false the paragraphs are not looked at.
+    """
+
+    outline = [ ]
+    # only the blocks that can hold headings and paragraphs are entered, so
+    # the inline nodes of the page are not visited, except in headings and
+    # at the start of paragraphs
+    stack = [ F_cmark_node_first_child(doc) ]
+    while stack:
+        node = stack.pop()
+        if not node:
+            continue
+        stack.append(F_cmark_node_next(node))
+        kind = F_cmark_node_get_type_string(node)
+        if kind == b'heading':
+            outline.append({
+                'type': 'heading',
+                'level': F_cmark_node_get_heading_level(node),
+                'text': inline_text(node),
+                'line': F_cmark_node_get_start_line(node),
+                'column': F_cmark_node_get_start_column(node),
+            })
+        elif kind == b'paragraph' and find_toc:
+            # most paragraphs start with text that is not the start of [TOC]
+            first = F_cmark_node_first_child(node)
+            if first and F_cmark_node_get_type_string(first) == b'text' and \
+               not b'[TOC]'.startswith(F_cmark_node_get_literal(first)):
+                continue
+            # the html is <p>[TOC]</p>
+            if inline_text(node, len('[TOC]')) == '[TOC]' and not in_tight_list(node):
+                outline.append({
+                    'type': 'toc',
+                    'level': 0,
+                    'text': '[TOC]',
+                    'line': F_cmark_node_get_start_line(node),
+                    'column': F_cmark_node_get_start_column(node),
+                })
+        elif kind in OUTLINE_CONTAINERS:
+            stack.append(F_cmark_node_first_child(node))
+    return outline
+
+
+# the blocks that may contain headings or paragraphs
+OUTLINE_CONTAINERS = (b'block_quote', b'list', b'item', b'custom_block', b'footnote_definition')
+
+
+# The plain text of the inline nodes of a heading or paragraph. With limit,
+# the walk stops once the text is longer, and returns None.
+def inline_text(node, limit=None):
+    parts = [ ]
+    size = 0
+    it = F_cmark_iter_new(node)
+    try:
+        while True:
+            event = F_cmark_iter_next(it)
+            if event == CMARK_EVENT_DONE:
+                break
+            kind = F_cmark_node_get_type_string(F_cmark_iter_get_node(it))
+            if kind in (b'text', b'code'):
+                parts.append(F_cmark_node_get_literal(F_cmark_iter_get_node(it)).decode('utf-8'))
+            elif kind in (b'softbreak', b'linebreak') and event == CMARK_EVENT_ENTER:
+                parts.append('\n')
+            else:
+                continue
+            size += len(parts[-1])
+            if limit is not None and size > limit:
+                return None
+    finally:
+        F_cmark_iter_free(it)
+    return ''.join(parts)
+
+
+# paragraphs in a tight list are rendered without <p>
+def in_tight_list(node):
+    parent = F_cmark_node_parent(node)
+    if parent and F_cmark_node_get_type_string(parent) == b'item':
+        return bool(F_cmark_node_get_list_tight(F_cmark_node_parent(parent)))
+    return False
+
+
+def render_batch(texts, workers, opts=OPTS, extensions=EXTENSIONS):
+    "Render a sequence of Markdown documents (bytes) using a bounded thread pool."
+
+    with concurrent.futures.ThreadPoolExecutor(max_workers=workers) as executor:
+        return list(executor.map(lambda text: render_gfm(text, opts, extensions), texts))
+
+
+# find the markdown sources in PAGE_PATHS that GFMReader will be asked to read,
+# skipping PAGE_EXCLUDES (which includes ARTICLE_PATHS) as Pelican's page generator does
+def find_sources(settings):
+    ignore = settings.get('IGNORE_FILES', [ ])
+    # the excluded directory names, by parent directory
+    excluded = { }
+    for exclude in settings.get('PAGE_EXCLUDES', [ ]):
+        parent, name = os.path.split(os.path.join(settings['PATH'], exclude))
+        excluded.setdefault(parent, set()).add(name)
+    sources = [ ]
+    for page_path in settings.get('PAGE_PATHS', [ '' ]):
+        top = os.path.join(settings['PATH'], page_path) if page_path else settings['PATH']
+        for root, dirs, files in os.walk(top, followlinks=True):
+            # prune excluded and ignored directories, as Pelican does
+            dirs[:] = [d for d in dirs
+                       if d not in excluded.get(root, ()) and not any(fnmatch.fnmatch(d, i) for i in ignore)]
+            for fname in files:
+                if any(fnmatch.fnmatch(fname, i) for i in ignore):
+                    continue
+                if os.path.splitext(fname)[1][1:] in GFMReader.file_extensions:
+                    sources.append(os.path.abspath(os.path.join(root, fname)))
+    # a page may be reachable from more than one PAGE_PATHS entry
+    return sorted(set(sources))
+
+
+# render every markdown page concurrently, ahead of Pelican's serial reads
+def prerender(pel_ob):
+    settings = pel_ob.settings
+    workers = settings.get('GFM_RENDER_WORKERS', GFM_RENDER_WORKERS)
+    if not workers or workers < 2:
+        return
+    # the worker processes of the asfpool plugin render the pages instead
+    if 'asfpool' in settings.get('PLUGINS', [ ]) and (settings.get('ASF_PAGE_WORKERS', GFM_RENDER_WORKERS) or 0) >= 2:
+        return
+
+    reader = GFMReader(settings)
+    paths = [ ]
+    texts = [ ]
+    for source_path in find_sources(settings):
+        try:
+            text, _metadata, _header_lines = reader.read_source_bytes(source_path)
+        except Exception:
+            # leave it to read() to report the problem
+            continue
+        if text:
+            paths.append(source_path)
+            texts.append(text)
+
+    _PRERENDERED.clear()
+    # pages in the render cache need no work at all
+    cache = render_cache(settings)
+    flavor = render_flavor(settings)
+    misses = [ ]
+    for source_path, text in zip(paths, texts):
+        result = cache.get(text, flavor) if cache else None
+        if result is None:
+            misses.append((source_path, text))
+        else:
+            _PRERENDERED[source_path] = (text, result)
+
+    print(f'gfm: pre-rendering {len(misses)} of {len(texts)} pages with {workers} workers')
+    results = render_batch([text for _path, text in misses], workers, *flavor)
+    for (source_path, text), result in zip(misses, results):
+        if cache:
+            cache.put(text, flavor, *result)
+        _PRERENDERED[source_path] = (text, result)
+
+
+# return the pre-rendered (html, outline) for a source, if the markdown has not changed since
+def prerendered(source_path, text):
+    entry = _PRERENDERED.pop(os.path.abspath(source_path), None)
+    if entry and entry[0] == text:
+        return entry[1]
+    return None
 
 
 def add_readers(readers):
     readers.reader_classes['md'] = GFMReader
 
 
+# drop the pages that were pre-rendered but not read
+def drop_prerendered(_generator):
+    _PRERENDERED.clear()
+
+
 def register():
+    pelican.plugins.signals.initialized.connect(prerender)
     pelican.plugins.signals.readers_init.connect(add_readers)
+    pelican.plugins.signals.page_generator_finalized.connect(drop_prerendered)
@@ -16,13 +16,20 @@ ASF_TOC = {
 from __future__ import unicode_literals
 
 import logging
+import os.path
 import re
+import sys
 
-from bs4 import BeautifulSoup, Comment
+from bs4 import Comment, Tag
 
 from pelican import contents, signals
 from pelican.utils import slugify
 
+# asfhtml is not a plugin. It is a helper module next to this one.
+if os.path.dirname(os.path.abspath(__file__)) not in sys.path:
+    sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+import asfhtml  # pylint: disable=wrong-import-position
+
 
 logger = logging.getLogger(__name__)
 
@@ -62,7 +69,7 @@ class HtmlTreeNode(object):
 
         if not new_string:
             new_string = new_header.find_all(
-                text=lambda t: not isinstance(t, Comment),
+                string=lambda t: not isinstance(t, Comment),
                 recursive=True)
             new_string = "".join(new_string)
 
@@ -82,23 +89,16 @@ class HtmlTreeNode(object):
         elif(self.level > new_level):
             return self.parent.add(new_header, ids)
 
-    def __str__(self):
-        ret = ""
-        if self.parent:
-            ret = "<a class='toc-href' href='#{0}' title='{1}'>{1}</a>".format(
-                self.id, self.header)
-
-        if self.children:
-            ret += "<ul>{}</ul>".format('{}' * len(self.children)).format(
-                *self.children)
-
-        if self.parent:
-            ret = "<li>{}</li>".format(ret)
-
-        if not self.parent:
-            ret = "<div id='toc' style='border-radius: 3px; border: 1px solid #999; background-color: #EEE; padding: 4px;'><h4>Table of Contents:</h4><ul>{}</ul></div>".format(ret)
-
-        return ret
+    # the ToC as Beautiful Soup tags, ready to insert into the page
+    def to_tag(self):
+        div = Tag(name='div', attrs={ 'id': 'toc', 'style': 'border-radius: 3px; border: 1px solid #999; background-color: #EEE; padding: 4px;' })
+        heading = Tag(name='h4')
+        heading.append('Table of Contents:')
+        div.append(heading)
+        ul = Tag(name='ul')
+        div.append(ul)
+        asfhtml.toc_lists(self, ul)
+        return div
 
 
 def init_default_config(pel_ob):
@@ -118,10 +118,15 @@ def generate_toc(content):
     if isinstance(content, contents.Static):
         return
 
+    # a page without a [TOC] is not parsed
+    pipeline = asfhtml.pipeline(content)
+    if pipeline.soup is None and not asfhtml.has_toc_marker(pipeline.text(), getattr(content, 'outline', None)):
+        return
+
     all_ids = set()
     title = content.metadata.get('title', 'Title')
     tree = node = HtmlTreeNode(None, title, 'h0', '')
-    soup = BeautifulSoup(content._content, 'html.parser') # pylint: disable=protected-access
+    soup = pipeline.parse()
     settoc = False
 
     try:
@@ -142,14 +147,13 @@ def generate_toc(content):
 
         if settoc:
             print("Generating ToC for %s" % content.slug)
-            tree_string = '{}'.format(tree)
-            tree_soup = BeautifulSoup(tree_string, 'html.parser')
-            content.toc = tree_soup.decode(formatter='html')
+            tree_tag = tree.to_tag()
+            content.toc = tree_tag.decode(formatter='html')
             itoc = soup.find('p', text='[TOC]')
             if itoc:
-                itoc.replaceWith(tree_soup)
+                itoc.replaceWith(tree_tag)
 
-        content._content = soup.decode(formatter='html')  # pylint: disable=protected-access
+        pipeline.changed()
 
 
 def register():
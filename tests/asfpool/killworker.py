@@ -0,0 +1,23 @@
+#
+# A plugin for testworkers.py: the worker process that reads the page named
+# by KILL_PAGE is killed, as the OOM killer or a crash in a C library would.
+#
+
+import os
+import signal
+
+import pelican.plugins.signals
+
+KILL_PAGE = 'page05.html'
+
+# the build process, which imports the plugins before the workers fork
+MAIN_PID = os.getpid()
+
+
+def kill_worker(content):
+    if os.getpid() != MAIN_PID and os.path.basename(content.source_path) == KILL_PAGE:
+        os.kill(os.getpid(), signal.SIGKILL)
+
+
+def register():
+    pelican.plugins.signals.content_object_init.connect(kill_worker)
@@ -0,0 +1,64 @@
+#!/usr/bin/env python3
+#
+# Check that a build with asfpool finishes when a worker is killed, and
+# writes the same pages as a serial build. Run from this directory:
+#
+#   python testworkers.py
+#
+
+import contextlib
+import filecmp
+import io
+import os
+import tempfile
+
+import pelican
+import pelican.settings
+
+THIS_DIR = os.path.abspath(os.path.dirname(__file__))
+PLUGINS = os.path.join(THIS_DIR, os.pardir, os.pardir, 'plugins')
+
+PAGES = 40
+
+
+def build(content, output, workers):
+    settings = pelican.settings.read_settings(override={
+        'PATH': content,
+        'OUTPUT_PATH': output,
+        'THEME': 'simple',
+        'SITEURL': 'https://test.apache.org',
+        'TIMEZONE': 'UTC',
+        'PAGE_PATHS': [ 'pages' ],
+        'ARTICLE_PATHS': [ 'blog' ],
+        'FEED_ALL_ATOM': None,
+        'PLUGIN_PATHS': [ PLUGINS, THIS_DIR ],
+        'PLUGINS': [ 'asfpool', 'killworker' ],
+        'ASF_PAGE_WORKERS': workers,
+    })
+    messages = io.StringIO()
+    with contextlib.redirect_stdout(messages):
+        pelican.Pelican(settings).run()
+    return messages.getvalue()
+
+
+def same_files(left, right):
+    compare = filecmp.dircmp(left, right)
+    if compare.left_only or compare.right_only or compare.diff_files or compare.funny_files:
+        return False
+    return all(same_files(os.path.join(left, sub), os.path.join(right, sub)) for sub in compare.common_dirs)
+
+
+with tempfile.TemporaryDirectory() as tmp:
+    pages = os.path.join(tmp, 'content', 'pages')
+    os.makedirs(pages)
+    for n in range(PAGES):
+        with open(os.path.join(pages, f'page{n:02d}.html'), 'w') as f:
+            f.write(f'<html><head><title>Page {n}</title></head><body><p>Page {n}</p></body></html>\n')
+
+    build(os.path.join(tmp, 'content'), os.path.join(tmp, 'serial'), 0)
+    log = build(os.path.join(tmp, 'content'), os.path.join(tmp, 'pooled'), 4)
+    print(''.join(line + '\n' for line in log.splitlines() if line.startswith('asfpool')), end='')
+
+    assert 'the workers failed' in log, 'the killed worker was not noticed'
+    assert same_files(os.path.join(tmp, 'serial'), os.path.join(tmp, 'pooled')), 'the builds differ'
+    print('OK')
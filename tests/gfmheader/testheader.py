@@ -0,0 +1,49 @@
+#!/usr/bin/env python3
+#
+# Check that the gfm reader finds the metadata header of a source with
+# LF, CRLF or CR line endings, renders the same page for each, and gives
+# outline lines of the source file. Run from this directory with
+# LIBCMARKDIR set:
+#
+#   PYTHONPATH="../../plugins" python testheader.py
+#
+
+import copy
+import os
+import tempfile
+
+import pelican.settings
+
+import gfm
+
+SOURCE = [
+    'Title: Line endings',
+    'license: https://www.apache.org/licenses/LICENSE-2.0',
+    '',
+    '# A heading',
+    '',
+    'A paragraph',
+    'over two lines.',
+    '',
+]
+
+with tempfile.TemporaryDirectory() as tmp:
+    settings = copy.deepcopy(pelican.settings.DEFAULT_CONFIG)
+    settings.update({ 'PATH': tmp, 'GFM_CACHE_DIR': None })
+    reader = gfm.GFMReader(settings)
+    os.makedirs(os.path.join(tmp, 'pages'))
+    pages = { }
+    for name, newline in (('lf', '\n'), ('crlf', '\r\n'), ('cr', '\r')):
+        path = os.path.join(tmp, 'pages', f'{name}.md')
+        with open(path, 'wb') as f:
+            f.write(newline.join(SOURCE).encode('utf-8'))
+        content, metadata = reader.read(path)
+        pages[name] = content
+        assert metadata['title'] == 'Line endings', f'{name}: title {metadata["title"]!r}'
+        assert metadata['license'] == 'https://www.apache.org/licenses/LICENSE-2.0', f'{name}: {metadata}'
+        assert '<h1>A heading</h1>' in content, f'{name}: {content!r}'
+        # the outline has the line of the heading in the source, after the header
+        assert metadata['outline'][0]['line'] == SOURCE.index('# A heading') + 1, f'{name}: {metadata["outline"]}'
+        print(f'{name}: {metadata["title"]!r}, {len(content)} characters of html')
+    assert pages['crlf'] == pages['lf'] and pages['cr'] == pages['lf'], pages
+    print('OK')
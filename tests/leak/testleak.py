@@ -0,0 +1,47 @@
+#!/usr/bin/env python3
+#
+# Render a markdown corpus thousands of times and check that the resident
+# memory does not grow. Run from this directory with LIBCMARKDIR set:
+#
+#   PYTHONPATH="../../plugins" python testleak.py
+#
+
+import resource
+import sys
+
+import gfm
+
+ITERATIONS = 5000
+ALLOWED_GROWTH_KB = 2048
+
+CORPUS = [
+    b'# Heading\n\nSome *emphasis* and a [link](https://apache.org).\n',
+    b'| a | b |\n|---|---|\n| 1 | 2 |\n' * 50,
+    b'~~strike~~ www.apache.org <script>alert(1)</script>\n' * 200,
+    '## Unicode éè ☃\n\n'.encode('utf-8') * 100,
+]
+
+
+def rss_kb():
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    if sys.platform == 'darwin':
+        rss //= 1024  # bytes on macOS
+    return rss
+
+
+def render_corpus():
+    for text in CORPUS:
+        assert gfm.render_gfm(text)
+
+
+# warm up, so allocator pools and caches are in place
+for _ in range(ITERATIONS // 10):
+    render_corpus()
+before = rss_kb()
+
+for _ in range(ITERATIONS):
+    render_corpus()
+after = rss_kb()
+
+print(f'RSS before: {before} KB, after: {after} KB')
+assert after - before < ALLOWED_GROWTH_KB, f'RSS grew by {after - before} KB'
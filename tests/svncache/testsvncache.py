@@ -0,0 +1,99 @@
+#!/usr/bin/env python3
+#
+# Check that asfdata reuses a cached release listing while the release
+# directory's revision stays the same, and lists it again after a commit.
+# Uses a file:// svn repository, so svn and svnadmin must be installed.
+# Run from this directory:
+#
+#   PYTHONPATH="../.." python testsvncache.py
+#
+
+import os
+import subprocess
+import tempfile
+
+import pelican
+import plugins.asfdata as asfdata
+
+settings = { # Keep pelican happy
+    'MARKDOWN': {},
+    'FORMATTED_FIELDS': [],
+    'PATH': '.',
+    'OUTPUT_PATH': 'output',
+    'THEME': 'simple',
+    'IGNORE_FILES': [],
+    'DELETE_OUTPUT_DIRECTORY': False,
+    'OUTPUT_RETENTION': 0,
+    'ASF_DATA': {
+        'data': 'asfdatasvn.yaml',
+        'metadata': {
+        },
+        'debug': False,
+    }
+}
+
+# the svn ls commands that asfdata runs
+listed = [ ]
+
+
+def os_popen(args):
+    if args[:2] == [ 'svn', 'ls' ]:
+        listed.append(args[-1])
+    return subprocess.Popen(args, stdout=subprocess.PIPE, universal_newlines=True)
+
+
+def svn(*args):
+    subprocess.run(args, check=True, stdout=subprocess.DEVNULL)
+
+
+# add a release of the project to the repository
+def release(repo, work, version):
+    directory = os.path.join(work, version)
+    os.makedirs(directory)
+    for ext in ('', '.asc', '.sha512'):
+        with open(os.path.join(directory, f'project-{version}-src.tar.gz{ext}'), 'w') as f:
+            f.write(f'{version}{ext}\n' * 100)
+    svn('svn', 'import', '-m', f'release {version}', directory, f'file://{repo}/project/{version}')
+
+
+def build():
+    del listed[:]
+    settings['ASF_DATA']['metadata'] = {}
+    asfdata.config_read_data(pelican.Pelican(settings))
+    metadata = settings['ASF_DATA']['metadata']
+    return [ (v.version, [ sorted(vars(d).items()) for d in v.release ]) for v in metadata['releases'] ]
+
+
+def test():
+    with tempfile.TemporaryDirectory() as tmpdir:
+        repo = os.path.join(tmpdir, 'repo')
+        svn('svnadmin', 'create', repo)
+        work = os.path.join(tmpdir, 'work')
+        release(repo, work, '1.0.0')
+        with open(os.path.join(work, 'KEYS'), 'w') as f:
+            f.write('keys\n')
+        svn('svn', 'import', '-m', 'KEYS', os.path.join(work, 'KEYS'), f'file://{repo}/project/KEYS')
+
+        asfdata.DIST_RELEASE = f'file://{repo}'
+        asfdata.os_popen = os_popen
+        settings['ASF_DATA_CACHE_DIR'] = os.path.join(tmpdir, 'cache')
+
+        first = build()
+        assert [ v for v, _ in first ] == [ '1.0.0' ]
+        assert len(listed) == 1
+        assert settings['ASF_DATA']['metadata']['releases-keys'] == 'https://downloads.apache.org/project/KEYS'
+
+        # the revision has not changed: the cached listing is used
+        second = build()
+        assert second == first
+        assert listed == [ ]
+
+        # a new release changes the revision
+        release(repo, work, '1.1.0')
+        third = build()
+        assert len(listed) == 1
+        assert sorted(v for v, _ in third) == [ '1.0.0', '1.1.0' ]
+        assert build() == third
+        assert listed == [ ]
+
+test()